@@ -1,55 +1,78 @@
-import requests
 import pandas as pd
 import streamlit as st
-import time
+import os
+import sys
 
-# Fonction pour obtenir tous les produits d'une catégorie en utilisant la pagination
-def get_all_products_by_category(category):
+# Rendre les modules partagés de app/ importables depuis les scripts à la racine
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+from http_client import http_get
+import product_store
+
+# Colonnes affichées pour chaque produit
+DISPLAY_COLUMNS = ["product_name", "code", "url", "quantity", "nutriments", "nutriscore_grade", "nova_group", "allergens", "labels", "countries_tags"]
+
+# Générateur qui renvoie les produits d'une catégorie page par page, au fur et à mesure
+# de leur arrivée : on ne garde jamais plus d'une page en mémoire, quelle que soit la taille de la catégorie
+def iter_product_pages(category):
     url = f"https://world.openfoodfacts.org/category/{category}.json"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
-    products = []
+    # Seulement les champs affichés ou stockés dans la base locale
+    fields = ",".join(dict.fromkeys(DISPLAY_COLUMNS + product_store.PRODUCT_FIELDS + ["categories_tags", "last_modified_t"]))
     page = 1  # Commence à la première page
 
     while True:
-        response = requests.get(f"{url}?page={page}", headers=headers)
-        
+        response = http_get(url, params={"page": page, "fields": fields})
+
         if response.status_code == 200:
             data = response.json()
             new_products = data.get('products', [])
             if not new_products:  # Si aucun nouveau produit n'est trouvé, on sort de la boucle
-                break
-            products.extend(new_products)  # Ajoute les nouveaux produits à la liste
+                return
+            yield new_products  # Renvoie la page courante
             page += 1  # Passe à la page suivante
-        
+
         elif response.status_code == 429:
-            st.warning("Limite de requêtes atteinte. Attente avant de réessayer...")
-            time.sleep(10)  # Attendre 10 secondes avant de réessayer
+            # http_get a déjà respecté Retry-After et réessayé : le quota de requêtes est épuisé
+            st.warning("Limite de requêtes atteinte. Réessayez dans quelques instants.")
+            return
         else:
             st.error(f"Erreur lors de la récupération des produits : {response.status_code}")
-            break
+            return
 
-    return products
+# Générateur qui renvoie les produits d'une catégorie un par un
+def iter_products_by_category(category):
+    for new_products in iter_product_pages(category):
+        yield from new_products
+
+# Fonction pour obtenir tous les produits d'une catégorie dans une seule liste
+# (à réserver aux petites catégories : préférer iter_product_pages)
+def get_all_products_by_category(category):
+    return list(iter_products_by_category(category))
+
+# Fonction qui consomme les pages d'un générateur : chaque lot est ajouté au tableau affiché
+# et/ou à la base locale, puis oublié. Renvoie le nombre de produits traités.
+def append_batches(batches, table=None, store=False):
+    total = 0
+    for batch in batches:
+        if table is not None:
+            table.add_rows(pd.DataFrame(batch, columns=DISPLAY_COLUMNS))
+        if store:
+            product_store.upsert_products(batch)
+        total += len(batch)
+    return total
 
 # Configuration de l'application Streamlit
 st.title("Produits Alimentaires par Catégorie")
 
 # Obtenir tous les produits dans la catégorie "Snack"
 category = "Snack"
-products = get_all_products_by_category(category)
-
-# Convertir les produits en DataFrame
-df_products = pd.DataFrame(products)
 
-# Vérifier que le DataFrame n'est pas vide
-if not df_products.empty:
-    # Afficher les colonnes les plus pertinentes
-    df_products_filtered = df_products[["product_name", "code", "url", "quantity", "nutriments", "nutriscore_grade", "nova_group", "allergens", "labels", "countries_tags"]]
+# Afficher les produits au fur et à mesure de leur arrivée (et les ajouter à la base locale si elle existe)
+st.subheader(f"Produits dans la catégorie : {category}")
+table = st.dataframe(pd.DataFrame(columns=DISPLAY_COLUMNS))
+total = append_batches(iter_product_pages(category), table, store=product_store.is_available())
 
-    # Afficher les premières lignes du DataFrame sur Streamlit
-    st.subheader(f"Produits dans la catégorie : {category}")
-    st.dataframe(df_products_filtered)  # Afficher le DataFrame dans Streamlit
+# Vérifier qu'au moins un produit a été trouvé
+if total:
+    st.write(f"{total} produits chargés.")
 else:
     st.write("Aucun produit trouvé dans cette catégorie.")
@@ -1,7 +1,7 @@
 # pages/0_🏠_Home Page.py
 
 import streamlit as st
-from functions import initialize_session_state, show_cart_sidebar
+from session import initialize_session_state, show_cart_sidebar
 
 # Initialize session state and display the cart sidebar
 initialize_session_state()
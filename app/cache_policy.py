@@ -0,0 +1,188 @@
+# cache_policy.py
+#
+# Central caching policy for the data functions of the app (replaces bare @st.cache_data).
+# Every cached function gets a time to live, a maximum number of entries and a maximum
+# size in bytes, keeps hit/miss/eviction metrics, and can be listed and purged from the
+# Cache Admin page.
+
+import hashlib
+import inspect
+import pickle
+import reprlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+MB = 1024 * 1024
+
+# Policy of each cached function: time to live (seconds), maximum entries and bytes
+CACHE_POLICIES = {
+    "search_product_by_category": {"ttl": 6 * 3600, "max_entries": 64, "max_bytes": 64 * MB},
+    "get_recipes_by_ingredient": {"ttl": 24 * 3600, "max_entries": 256, "max_bytes": 8 * MB},
+    "get_recipe_details": {"ttl": 7 * 24 * 3600, "max_entries": 1024, "max_bytes": 16 * MB},
+    "process_products": {"ttl": 3600, "max_entries": 32, "max_bytes": 64 * MB},
+}
+
+# Policy of the functions that are not listed above
+DEFAULT_POLICY = {"ttl": 3600, "max_entries": 128, "max_bytes": 32 * MB}
+
+# Function to check if a result is worth caching. Failed calls return None, an empty result
+# or an "Error: ..." message: they are not kept, so the next call tries again.
+# A policy can give its own check with a "cacheable" entry.
+def is_cacheable(result):
+    if result is None:
+        return False
+    if isinstance(result, str):
+        return not result.startswith("Error")
+    try:
+        return len(result) > 0
+    except TypeError:
+        return True
+
+
+class PolicyCache:
+    # LRU cache of pickled results, bounded in entries and bytes, with a time to live.
+    # Results are stored pickled (like st.cache_data), so each caller gets its own copy.
+    def __init__(self, name, ttl, max_entries, max_bytes):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> entry dict, least recently used first
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.bytes -= entry["size"]
+
+    def get(self, key):
+        # Get the pickled result of a key (None if missing or expired)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry["created_at"] > self.ttl:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            entry["hits"] += 1
+            entry["last_used"] = time.time()
+            self.hits += 1
+            return entry["value"]
+
+    def put(self, key, value, label=""):
+        # Store a pickled result, then evict the least recently used entries over the limits
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = {"value": value, "size": len(value), "label": label,
+                                 "created_at": now, "last_used": now, "hits": 0}
+            self.bytes += len(value)
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def purge(self, key=None):
+        # Remove one entry, or every entry if no key is given
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+                self.bytes = 0
+            elif key in self.entries:
+                self._remove(key)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "function": self.name,
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+    def list_entries(self):
+        now = time.time()
+        with self.lock:
+            return [
+                {"key": key, "arguments": entry["label"], "size": entry["size"], "hits": entry["hits"],
+                 "age": now - entry["created_at"], "expires_in": self.ttl - (now - entry["created_at"])}
+                for key, entry in self.entries.items()
+            ]
+
+
+# Every cache of the process, by function name
+_caches = {}
+
+# Decorator caching a function with its policy from CACHE_POLICIES
+def cached(function):
+    name = function.__name__
+    policy = dict(CACHE_POLICIES.get(name, DEFAULT_POLICY))
+    cacheable = policy.pop("cacheable", is_cacheable)
+    cache = _caches[name] = PolicyCache(name, **policy)
+    signature = inspect.signature(function)
+
+    def cache_key(args, kwargs):
+        # The same call with positional or keyword arguments gets the same key
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = tuple(bound.arguments.items())
+        return hashlib.sha1(pickle.dumps(arguments, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest(), arguments
+
+    def compute(key, arguments, args, kwargs):
+        result = function(*args, **kwargs)
+        if not cacheable(result):
+            return result
+        # Short description of the arguments for the admin page (large lists are abbreviated)
+        label = ", ".join(f"{arg}={reprlib.repr(arg_value)}" for arg, arg_value in arguments)
+        cache.put(key, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), label)
+        return result
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        key, arguments = cache_key(args, kwargs)
+        value = cache.get(key)
+        if value is not None:
+            return pickle.loads(value)
+        return compute(key, arguments, args, kwargs)
+
+    # Call the function even if its result is cached, and replace the cached result
+    # (used to refresh the cache ahead of its expiry, see prewarm.py)
+    def refresh(*args, **kwargs):
+        key, arguments = cache_key(args, kwargs)
+        return compute(key, arguments, args, kwargs)
+
+    wrapper.cache = cache
+    wrapper.clear = cache.purge
+    wrapper.refresh = refresh
+    return wrapper
+
+# Function to get the metrics of every cache
+def cache_stats():
+    return [cache.stats() for cache in _caches.values()]
+
+# Function to list the entries of a cache
+def list_entries(name):
+    return _caches[name].list_entries()
+
+# Function to purge one entry of a cache, a whole cache, or every cache
+def purge(name=None, key=None):
+    for cache_name, cache in _caches.items():
+        if name is None or cache_name == name:
+            cache.purge(key)
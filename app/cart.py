@@ -0,0 +1,100 @@
+# cart.py
+#
+# Cart of the selected products, kept in st.session_state.selected_products.
+# It behaves like the list it replaces (len, iteration, indexing, append, pop) and keeps
+# a running total of each nutrient, updated when a product is added or removed, so the
+# dashboard charts never have to loop over the products to sum them. The charts and the
+# Compare table read a products x nutrients NumPy matrix, built once per version of the cart.
+
+from array import array
+
+from product_record import NUTRIENT_KEYS, ProductRecord
+from product_cache import PRODUCT_CACHE
+
+# Maximum number of products in the cart
+MAX_CART_SIZE = 5
+
+
+class Cart:
+    # Matrix of the nutrients and version of the cart it was built for
+    _matrix = None
+    _matrix_version = -1
+
+    def __init__(self, products=()):
+        self.products = []
+        self.totals = array('d', [0.0] * len(NUTRIENT_KEYS))  # Sum of each nutrient, in NUTRIENT_KEYS order
+        self.version = 0  # Incremented on every change
+        for product in products:
+            self.append(product)
+
+    def __len__(self):
+        return len(self.products)
+
+    def __iter__(self):
+        return iter(self.products)
+
+    def __getitem__(self, index):
+        return self.products[index]
+
+    def __bool__(self):
+        return bool(self.products)
+
+    def is_full(self):
+        return len(self.products) >= MAX_CART_SIZE
+
+    def _add_to_totals(self, record, sign):
+        # Missing nutrients (NaN) count as 0, like in the charts
+        for i, value in enumerate(record.nutrient_values):
+            if value == value:
+                self.totals[i] += sign * value
+
+    def append(self, product):
+        # Products are kept as the shared compact records
+        record = product if isinstance(product, ProductRecord) else PRODUCT_CACHE.intern(product)
+        self.products.append(record)
+        self._add_to_totals(record, 1)
+        self.version += 1
+
+    def pop(self, index=-1):
+        record = self.products.pop(index)
+        if self.products:
+            self._add_to_totals(record, -1)
+        else:
+            # Empty cart: reset the totals instead of keeping rounding errors
+            self.totals = array('d', [0.0] * len(NUTRIENT_KEYS))
+        self.version += 1
+        return record
+
+    def matrix(self):
+        # Products x nutrients matrix (columns in NUTRIENT_KEYS order, NaN when missing),
+        # rebuilt only after the cart changed
+        if self._matrix_version != self.version:
+            self._matrix = build_matrix(self.products)
+            self._matrix_version = self.version
+        return self._matrix
+
+    def nutrient_totals(self):
+        # Totals as a dict, e.g. {'energy-kcal': 1250.0, 'fat': 42.5, ...}
+        return dict(zip(NUTRIENT_KEYS, self.totals))
+
+# Function to build the products x nutrients matrix of a list of records
+def build_matrix(records):
+    import numpy as np  # Only loaded by the pages that draw charts
+
+    matrix = np.empty((len(records), len(NUTRIENT_KEYS)))
+    for row, record in enumerate(records):
+        matrix[row] = record.nutrient_values
+    matrix.setflags(write=False)  # Shared by every chart: never modified in place
+    return matrix
+
+# Function to get the nutrient matrix of a list of products (cached on a Cart)
+def nutrient_matrix(products):
+    return products.matrix() if isinstance(products, Cart) else Cart(products).matrix()
+
+# Function to get the total of each nutrient of a list of products (read from the running totals of a Cart)
+def nutrient_totals(products):
+    if isinstance(products, Cart):
+        return products.nutrient_totals()
+    import numpy as np
+
+    return dict(zip(NUTRIENT_KEYS, np.nansum(nutrient_matrix(products), axis=0)))
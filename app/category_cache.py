@@ -0,0 +1,97 @@
+# category_cache.py
+#
+# On-disk cache of processed category DataFrames, stored as compressed Arrow IPC (Feather v2) files:
+# columnar and typed, readable column by column and memory-mapped when loaded.
+# Each file records when its category was fetched, so stale categories are refetched.
+# Frames are kept apart by producer: the app and the prototype scripts (e.g. test_api_csv.py)
+# process the same categories into frames with different columns and filters.
+
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from product_store import category_tag
+from storage import DATA_DIR
+
+CACHE_DIR = os.path.join(DATA_DIR, "cache", "categories")
+
+# A cached category is considered fresh for one day by default
+DEFAULT_MAX_AGE = 24 * 3600
+
+# Producer of the frames of the app (functions.process_products)
+APP_PRODUCER = "app"
+
+# Function to get the cache file of a category
+def cache_path(category, producer=APP_PRODUCER):
+    return os.path.join(CACHE_DIR, producer, category_tag(category).replace(":", "_") + ".arrow")
+
+# Nutrient columns produced by process_products, always stored as numbers
+NUMERIC_COLUMNS = ['Energy kcal', 'Fat', 'Saturated fat', 'Carbohydrates', 'Sugars', 'Fiber', 'Proteins', 'Salt']
+
+# Function to give each column a proper type (numbers stay numbers, text becomes string)
+def typed_frame(df):
+    df = df.copy()
+    for column in df.columns:
+        if column in NUMERIC_COLUMNS:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("float64")
+            continue
+        if df[column].dtype != object:
+            continue
+        values = df[column].dropna()
+        if len(values) and values.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)).all():
+            numbers = pd.to_numeric(df[column])
+            # Whole numbers (e.g. nova_group) keep an integer type, even with missing values
+            if (numbers.dropna() % 1 == 0).all():
+                df[column] = numbers.astype("Int64")
+            else:
+                df[column] = numbers.astype("float64")
+        else:
+            df[column] = df[column].map(lambda v: v if v is None or isinstance(v, str) else str(v)).astype("string")
+    return df
+
+# Function to save the processed DataFrame of a category
+def save_category_frame(category, df, producer=APP_PRODUCER):
+    path = cache_path(category, producer)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(typed_frame(df), preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"category": category.encode("utf-8"),
+        b"producer": producer.encode("utf-8"),
+        b"fetched_at": str(time.time()).encode("ascii"),
+        b"rows": str(table.num_rows).encode("ascii")
+    })
+
+    # Write to a temporary file first so readers never see a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    feather.write_feather(table, tmp_path, compression="lz4")
+    os.replace(tmp_path, path)
+
+# Function to read the freshness metadata of a cached category (None if not cached)
+def category_cache_info(category, producer=APP_PRODUCER):
+    path = cache_path(category, producer)
+    if not os.path.exists(path):
+        return None
+    # Only the schema (footer) of the file is read here, not the data
+    with pa.memory_map(path) as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    if metadata.get(b"producer", b"").decode("utf-8") != producer:
+        return None  # Written by another producer (or before producers were recorded)
+    fetched_at = float(metadata.get(b"fetched_at", b"0"))
+    return {
+        "category": category,
+        "fetched_at": fetched_at,
+        "age": time.time() - fetched_at,
+        "rows": int(metadata.get(b"rows", b"0"))
+    }
+
+# Function to load a cached category (only the requested columns), or None if missing or stale
+def load_category_frame(category, columns=None, max_age=DEFAULT_MAX_AGE, producer=APP_PRODUCER):
+    info = category_cache_info(category, producer)
+    if info is None or (max_age is not None and info["age"] > max_age):
+        return None
+    table = feather.read_table(cache_path(category, producer), columns=columns, memory_map=True)
+    return table.to_pandas()
@@ -0,0 +1,266 @@
+# category_stats.py
+#
+# Statistics over every product of a category in the local product store (see product_store.py),
+# computed in a single pass with streaming algorithms:
+# - counts of the Nutri-Score, Eco-Score and NOVA grades
+# - for each nutrient: mean and variance (Welford), a fixed-bin histogram and approximate
+#   quantiles (KLL sketch)
+#
+# The results are materialised as one JSON file per category in data/category_stats and
+# refreshed incrementally: only the products added since the last refresh (higher rowids)
+# are read. Products updated in place keep their rowid, so a full rebuild is done every
+# FULL_REBUILD_INTERVAL to take their changes into account.
+#
+#     python app/category_stats.py refresh Snacks Fruits [--full]
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+
+import product_store
+from product_record import NUTRIENT_KEYS, to_float
+from storage import DATA_DIR
+
+# Location of the materialised statistics
+CACHE_DIR = os.path.join(DATA_DIR, "category_stats")
+
+# How often the statistics of a category are refreshed (new products), and fully rebuilt
+REFRESH_INTERVAL = 15 * 60
+FULL_REBUILD_INTERVAL = 24 * 3600
+
+# Grades counted for each product
+GRADE_FIELDS = ("nutriscore_grade", "ecoscore_grade", "nova_group")
+
+# Histogram of each nutrient (per 100 g): (lowest value, highest value, number of bins).
+# Values above the highest value are counted in the last bin.
+HISTOGRAM_BINS = {
+    "energy-kcal": (0, 900, 30),
+    "fat": (0, 100, 20),
+    "saturated-fat": (0, 50, 20),
+    "carbohydrates": (0, 100, 20),
+    "sugars": (0, 100, 20),
+    "fiber": (0, 50, 25),
+    "proteins": (0, 100, 20),
+    "salt": (0, 10, 20)
+}
+
+# Accuracy of the quantile sketches (a larger k is more accurate but bigger)
+KLL_K = 200
+
+# Quantiles shown by the Categories page
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+class KLLSketch:
+    # KLL quantile sketch: a stack of compactors holding at most about 3k values in total,
+    # whatever the number of values added. When a level is full, it is sorted and every
+    # other value (starting at a random offset) is promoted to the next level with twice
+    # the weight.
+    def __init__(self, k=KLL_K, levels=None):
+        self.k = k
+        self.levels = levels or [[]]
+        self.random = random.Random()
+
+    def capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def add(self, value):
+        self.levels[0].append(value)
+        if len(self.levels[0]) >= self.capacity(0):
+            self.compress()
+
+    def compress(self):
+        # Compact every full level, from the bottom (a promotion may fill the next level)
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) >= self.capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                items.sort()
+                offset = self.random.randint(0, 1)
+                self.levels[level + 1].extend(items[offset::2])
+                self.levels[level] = []
+            level += 1
+
+    def quantiles(self, fractions):
+        # Values with their weight (2 ** level), sorted
+        weighted = sorted((value, 2 ** level) for level, items in enumerate(self.levels) for value in items)
+        total = sum(weight for _, weight in weighted)
+        if not total:
+            return [None] * len(fractions)
+        results = []
+        for fraction in fractions:
+            rank = fraction * total
+            seen = 0
+            for value, weight in weighted:
+                seen += weight
+                if seen >= rank:
+                    results.append(value)
+                    break
+        return results
+
+
+class NutrientStats:
+    # Running count, mean and variance (Welford), histogram and quantile sketch of a nutrient
+    def __init__(self, key, state=None):
+        self.key = key
+        self.low, self.high, self.bins = HISTOGRAM_BINS[key]
+        state = state or {}
+        self.count = state.get("count", 0)
+        self.mean = state.get("mean", 0.0)
+        self.m2 = state.get("m2", 0.0)
+        self.histogram = state.get("histogram", [0] * self.bins)
+        self.sketch = KLLSketch(levels=state.get("sketch"))
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        width = (self.high - self.low) / self.bins
+        self.histogram[min(self.bins - 1, max(0, int((value - self.low) / width)))] += 1
+        self.sketch.add(value)
+
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "histogram": self.histogram, "sketch": self.sketch.levels}
+
+
+class CategoryStats:
+    def __init__(self, category, state=None):
+        state = state or {}
+        self.category = category
+        self.count = state.get("count", 0)
+        self.last_rowid = state.get("last_rowid", 0)
+        self.rebuilt_at = state.get("rebuilt_at", time.time())
+        self.refreshed_at = state.get("refreshed_at", 0)
+        self.grades = state.get("grades", {field: {} for field in GRADE_FIELDS})
+        nutrients = state.get("nutrients", {})
+        self.nutrients = {key: NutrientStats(key, nutrients.get(key)) for key in NUTRIENT_KEYS}
+
+    def add(self, product):
+        self.count += 1
+        for field in GRADE_FIELDS:
+            grade = str(product.get(field) or "Not available").upper()
+            self.grades[field][grade] = self.grades[field].get(grade, 0) + 1
+
+        nutriments = product.get("nutriments") or {}
+        for key, stats in self.nutrients.items():
+            value = to_float(nutriments.get(f"{key}_100g", nutriments.get(key)))
+            if value == value and value >= 0:  # Skip missing (NaN) and invalid values
+                stats.add(value)
+
+    def summary(self, key):
+        # Mean, standard deviation and quantiles of a nutrient
+        stats = self.nutrients[key]
+        summary = {"count": stats.count, "mean": stats.mean, "std": math.sqrt(stats.variance())}
+        for fraction, value in zip(QUANTILES, stats.sketch.quantiles(QUANTILES)):
+            summary[f"p{int(fraction * 100)}"] = value
+        return summary
+
+    def histogram(self, key):
+        # Histogram of a nutrient as (bin start, bin end, count) tuples
+        stats = self.nutrients[key]
+        width = (stats.high - stats.low) / stats.bins
+        return [(stats.low + i * width, stats.low + (i + 1) * width, count) for i, count in enumerate(stats.histogram)]
+
+    def to_dict(self):
+        return {
+            "category": self.category,
+            "count": self.count,
+            "last_rowid": self.last_rowid,
+            "rebuilt_at": self.rebuilt_at,
+            "refreshed_at": self.refreshed_at,
+            "grades": self.grades,
+            "nutrients": {key: stats.to_dict() for key, stats in self.nutrients.items()}
+        }
+
+
+# Function to get the path of the materialised statistics of a category
+def stats_path(category):
+    return os.path.join(CACHE_DIR, re.sub(r"[^a-z0-9]+", "-", category.lower()).strip("-") + ".json")
+
+# Function to read the materialised statistics of a category (None if never computed)
+def load_stats(category):
+    try:
+        with open(stats_path(category), encoding="utf-8") as file:
+            return CategoryStats(category, json.load(file))
+    except (OSError, ValueError):
+        return None
+
+# Function to write the statistics of a category (atomically, so readers never see a partial file)
+def save_stats(stats):
+    path = stats_path(stats.category)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{threading.get_ident()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(stats.to_dict(), file)
+    os.replace(temporary, path)
+
+# Function to bring the statistics of a category up to date: only the products added since the
+# last refresh are read, unless a full rebuild is due (or asked for)
+def refresh_stats(category, full=False, path=None):
+    stats = None if full else load_stats(category)
+    if stats is None or time.time() - stats.rebuilt_at > FULL_REBUILD_INTERVAL:
+        stats = CategoryStats(category)
+
+    for rowid, product in product_store.iter_category_rows(category, stats.last_rowid, path):
+        stats.add(product)
+        stats.last_rowid = rowid
+
+    stats.refreshed_at = time.time()
+    save_stats(stats)
+    return stats
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+# Function to get the statistics of a category for the page: the materialised ones are returned
+# at once, and refreshed in a background thread if they are older than `max_age`
+def get_stats(category, max_age=REFRESH_INTERVAL):
+    stats = load_stats(category)
+    if stats is not None and time.time() - stats.refreshed_at < max_age:
+        return stats
+
+    with _refreshing_lock:
+        if category in _refreshing:
+            return stats
+        _refreshing.add(category)
+
+    def run():
+        try:
+            refresh_stats(category)
+        except Exception as e:
+            print(f"Statistics of category {category} failed: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(category)
+
+    threading.Thread(target=run, name=f"stats-{category}", daemon=True).start()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Statistics over every product of a category")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    refresh_parser = subparsers.add_parser("refresh", help="Update the statistics of categories")
+    refresh_parser.add_argument("categories", nargs="+", help="Category names (e.g. Snacks)")
+    refresh_parser.add_argument("--full", action="store_true", help="Recompute from scratch")
+    refresh_parser.add_argument("--store", default=None, help=f"Store path (default: {product_store.STORE_PATH})")
+
+    args = parser.parse_args()
+    if args.command == "refresh":
+        for category in args.categories:
+            stats = refresh_stats(category, args.full, args.store)
+            print(f"{category}: {stats.count} products")
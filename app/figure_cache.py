@@ -0,0 +1,59 @@
+# figure_cache.py
+#
+# Memoisation of the Plotly figures of the dashboard pages. Streamlit reruns the whole
+# script on every widget change; a figure is now only rebuilt when its inputs changed:
+# the products of the cart (identified by their barcodes) and the goals it depends on.
+
+import threading
+from collections import OrderedDict
+
+# Maximum number of figures kept in memory (shared by every session of the process)
+MAX_FIGURES = 256
+
+# Function to get a cheap fingerprint of a list of products: their barcodes, in order
+def cart_fingerprint(products):
+    return tuple(product.get('code') or product.get('product_name') for product in products)
+
+
+class FigureCache:
+    def __init__(self, max_figures=MAX_FIGURES):
+        self.max_figures = max_figures
+        self.figures = OrderedDict()  # key -> figure, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            figure = self.figures.get(key)
+            if figure is None:
+                self.misses += 1
+                return None
+            self.figures.move_to_end(key)
+            self.hits += 1
+            return figure
+
+    def put(self, key, figure):
+        with self.lock:
+            self.figures[key] = figure
+            self.figures.move_to_end(key)
+            while len(self.figures) > self.max_figures:
+                self.figures.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {"figures": len(self.figures), "max_figures": self.max_figures, "hits": self.hits, "misses": self.misses}
+
+
+FIGURE_CACHE = FigureCache()
+
+# Function to get the figure `name` for a list of products, building it with
+# build(products, *args) only if it isn't cached yet. `key` holds the other inputs
+# of the figure (e.g. the goals it compares the products to).
+def figure_for(name, products, build, *args, key=()):
+    cache_key = (name, cart_fingerprint(products), key)
+    figure = FIGURE_CACHE.get(cache_key)
+    if figure is None:
+        figure = build(products, *args)
+        FIGURE_CACHE.put(cache_key, figure)
+    return figure
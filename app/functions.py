@@ -1,190 +1,259 @@
 # functions.py
+#
+# pandas, numpy, plotly and the HTTP client (requests) are imported inside the functions that
+# use them, so that pages only pay for the libraries of the functions they call.
 
-import requests
-import plotly.express as px
-import pandas as pd
 import streamlit as st
-import plotly.graph_objects as go
-import re
-
-def initialize_session_state():
-    # Check if "objectifs" (goals) is already initialized in session state
-    # If not, initialize it with default values for fats, sugars, salt, and calories
-    if "objectifs" not in st.session_state:
-        st.session_state.objectifs = {"graisses": 70, "sucres": 50, "sel": 6, "calories": 2000}
-
-    # Check if "selected_products" is already initialized in session state
-    # If not, initialize it as an empty list (this will hold selected products)
-    if "selected_products" not in st.session_state:
-        st.session_state.selected_products = []
-
-    # Check if "show_search" is already initialized in session state
-    # If not, initialize it as False (controls whether the search interface is shown)
-    if "show_search" not in st.session_state:
-        st.session_state.show_search = False
-
-    # Check if "search_results" is already initialized in session state
-    # If not, initialize it as an empty list (this will hold search results)
-    if "search_results" not in st.session_state:
-        st.session_state.search_results = []
-
-def show_cart_sidebar():
-   with st.sidebar:
-       # Display the sidebar subheader for the cart
-       st.subheader("Cart", anchor="cart-subheader")
-
-       # Check if there are products in the selected_products list
-       if st.session_state.selected_products:
-           # Loop through each selected product and display its name
-           for index, product in enumerate(st.session_state.selected_products):
-               product_name = product.get('product_name', 'Unknown')
-               st.write(f"- {product_name}")
-
-               # Add a button to remove the product from the cart
-               # When clicked, remove the product and show a success message
-               if st.button(f"Remove {product_name}", key=f"remove_{index}", use_container_width=True):
-                   st.session_state.selected_products.pop(index)
-                   st.success(f"{product_name} removed from cart")
-                   st.rerun()  # Re-run the app to update the cart display
-       else:
-           # If the cart is empty, display a message
-           st.write("Your cart is empty.")
-           
-       # Button to add a product to the cart
-       # When clicked, show the product search interface and switch pages
-       if st.button("Add product", key="add_product", use_container_width=True):
-           st.session_state.show_search = True
-           st.switch_page("pages/1 - 🛒 Products.py")
+import contextvars
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from rate_limiter import MAX_WAIT, RateLimitExceeded, bucket_for, is_background
+from tags import clean_prefixes, clean_tag, clean_tag_column
+from countries import iso3
+from figure_cache import figure_for
+from cart import nutrient_matrix, nutrient_totals
+from product_record import NUTRIENT_KEYS
+import product_store
+import meal_store
+from product_store import PRODUCT_FIELDS
+from product_cache import cache_products
+from cache_policy import cached
+from session import initialize_session_state, show_cart_sidebar
+
+# Categories offered by the Products and Categories pages (and prewarmed, see prewarm.py)
+CATEGORIES = ["Snacks", "Cereals and Potatoes", "Fruits", "Vegetables", "Dairy", "Beverages", "Waters"]
 
 # Function to search for a product by name
 def search_product(query):
-    # Construct the URL for the OpenFoodFacts API with the search query
-    url = f"https://world.openfoodfacts.org/cgi/search.pl?search_terms={query}&search_simple=1&action=process&json=1"
+    from http_client import http_get
+
+    # Use the local product store when it has been built
+    if product_store.is_available():
+        products = product_store.search_products(query)
+        if products:
+            return cache_products(products)
+        # Nothing found in the store: ask the API
+
+    # OpenFoodFacts search API with the search query
+    url = "https://world.openfoodfacts.org/cgi/search.pl"
+    params = {
+        'search_terms': query,
+        'search_simple': 1,
+        'action': 'process',
+        'json': 1,
+        'fields': ','.join(PRODUCT_FIELDS)
+    }
     
     # Send a GET request to the API
-    response = requests.get(url)
+    response = http_get(url, params=params)
     
     # Check if the request was successful (HTTP status 200)
     if response.status_code == 200:
         # Parse the JSON response to extract the list of products
         data = response.json()
-        return data.get('products', [])
+        return cache_products(data.get('products', []))
     else:
         # Display an error message if the request failed
         st.error(f"Error occurred while searching for product: {response.status_code}")
         return []
 
-# Function to search for products by category
-@st.cache_data
+# Maximum number of category pages requested at the same time
+MAX_PARALLEL_PAGES = 4
+
+
+class IncompleteSearch(Exception):
+    # Raised when a search had to stop before finding the products asked for (rate limit or
+    # request error). It holds the products found so far, which are not cached as a result.
+    def __init__(self, products, nb_items):
+        super().__init__(f"Only {len(products)} of the {nb_items} products could be fetched: "
+                         "OpenFoodFacts is busy, please try again in a minute.")
+        self.products = products
+
+# Function to check if a product has all the information displayed by the app
+def is_valid_product(product):
+    if not (product.get('product_name') and 
+            product.get('nutriments') and 
+            product.get('nutriscore_grade') not in [None, '', 'unknown', 'UNKNOWN'] and
+            product.get('ecoscore_grade') not in [None, '', 'unknown', 'UNKNOWN'] and
+            product.get('countries_tags') and 
+            product.get('nova_group')):
+        return False
+
+    nutriments = product.get('nutriments', {})
+
+    # Check if the required nutriments are present
+    return all(nutriments.get(key) not in [None, '', 0, 'unknown', 'UNKNOWN'] 
+               for key in ["energy-kcal", "fat", "saturated-fat", "carbohydrates", 
+                           "sugars", "proteins", "salt"])
+
+# Function to fetch a single page of a category (returns None if the request failed).
+# The request is given up if `cancelled` is set, or `deadline` (time.monotonic) passes,
+# while it waits for the rate limiter: RateLimitExceeded is raised then.
+def fetch_category_page(url, page, page_size, cancelled=None, deadline=None):
+    from http_client import http_get
+
+    max_wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+    response = http_get(url, params={'page': page, 'page_size': page_size, 'fields': ','.join(PRODUCT_FIELDS)},
+                        cancelled=cancelled, max_wait=max_wait)
+    if response.status_code == 429:
+        raise RateLimitExceeded(url)
+    if response.status_code != 200:
+        return None
+    return response.json().get('products', [])
+
+# Function to search for products by category.
+# Raises IncompleteSearch if fewer than `nb_items` products could be fetched while the
+# category has more (the rate limiter or the API stopped the crawl).
+@cached
 def search_product_by_category(category, nb_items=20):
-    # URL to fetch products from the specified category
-    url = f"https://world.openfoodfacts.org/category/{category}.json"
-    
-    # Custom headers for the request
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-
     # List to store the found products
     products = []
+    stored = []  # Products of the local store, kept in case the API can't be reached
+
+    # Use the local product store when it has been built (and keep it fresh in the background)
+    if product_store.is_available():
+        product_store.ensure_fresh(category)
+        for product in product_store.iter_category_products(category):
+            if is_valid_product(product):
+                products.append(product)
+                if len(products) >= nb_items:
+                    return cache_products(products)
+        # Not enough products stored for this category: fetch it from the API
+        stored, products = products, []
+
+    # URL to fetch products from the specified category
+    url = f"https://world.openfoodfacts.org/category/{category}.json"
     
     # Pagination parameters
-    page = 1
     page_size = 100
-
-    # Continue fetching until we reach the desired number of items
-    while len(products) < nb_items:  
-        try:
-            # Request the product data for the current page
-            response = requests.get(f"{url}?page={page}&page_size={page_size}", headers=headers, timeout=10)
-            
-            # If the response is successful (status 200)
-            if response.status_code == 200:
-                # Parse the JSON response
-                data = response.json()
-                new_products = data.get('products', [])
-                
-                # If no new products were found, stop the loop
-                if not new_products:
-                    break
-                
-                # Filter the products based on the required conditions
-                for product in new_products:
-                    if (product.get('product_name') and 
-                        product.get('nutriments') and 
-                        product.get('nutriscore_grade') not in [None, '', 'unknown', 'UNKNOWN'] and
-                        product.get('ecoscore_grade') not in [None, '', 'unknown', 'UNKNOWN'] and
-                        product.get('countries_tags') and 
-                        product.get('nova_group')):
-                        
-                        nutriments = product.get('nutriments', {})
-                        
-                        # Check if the required nutriments are present
-                        if all(nutriments.get(key) not in [None, '', 0, 'unknown', 'UNKNOWN'] 
-                               for key in ["energy-kcal", "fat", "saturated-fat", "carbohydrates", 
-                                           "sugars", "proteins", "salt"]):
-                            products.append(product)
-                            if len(products) >= nb_items:
-                                break
-                
-                # Move to the next page
-                page += 1
-            else:
-                break  # Stop if we get an unsuccessful response
-
-        except:
-            break  # Exit in case of any exception (e.g., timeout)
+    next_page = 1      # Next page to request
+    current_page = 1   # Next page to filter (pages are consumed in order)
+    pending = {}       # Page number -> future of the request in flight
+    done = threading.Event()  # Set once the crawl is over: the requests still waiting for a token give up
+
+    # Start with a single page, and only request pages ahead once they are likely to be needed,
+    # within the tokens the rate limiter can give right away: the category pages have a small
+    # budget shared by every session, and pages sent but not needed would use up the budget
+    # of the next searches
+    bucket = bucket_for(url)
+    window = 1
+
+    # A user's crawl waits at most MAX_WAIT for the rate limiter in total, not on each page
+    # (the prewarm worker runs in the background and can wait as long as needed)
+    deadline = None if is_background() else time.monotonic() + MAX_WAIT
+    complete = False  # Whether the crawl found the products asked for, or every product of the category
+
+    # Keep up to `window` requests in flight, but filter the pages
+    # strictly in page order so the result is the same as a sequential crawl
+    executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_PAGES)
+    try:
+        while len(products) < nb_items:
+            # Launch new page requests until the window is full
+            # (in the caller's context, so they keep its priority, see rate_limiter.background_priority)
+            while len(pending) < window:
+                pending[next_page] = executor.submit(contextvars.copy_context().run, fetch_category_page, url, next_page, page_size, done, deadline)
+                next_page += 1
+
+            try:
+                # Wait for the next page in order
+                new_products = pending.pop(current_page).result()
+            except Exception:
+                break  # Exit in case of any exception (e.g., timeout, rate limit)
+
+            # Stop on an unsuccessful response, or when no new products were found (end of the category)
+            if new_products is None:
+                break
+            if not new_products:
+                complete = True
+                break
+
+            # Filter the products based on the required conditions
+            for product in new_products:
+                if is_valid_product(product):
+                    products.append(product)
+                    if len(products) >= nb_items:
+                        break
+
+            # Move to the next page
+            current_page += 1
+
+            # Widen the window to the number of pages still needed (from the share of valid
+            # products so far), without going over the tokens available
+            if len(products) < nb_items:
+                per_page = len(products) / (current_page - 1)
+                pages_needed = math.ceil((nb_items - len(products)) / per_page) if per_page else MAX_PARALLEL_PAGES
+                tokens = MAX_PARALLEL_PAGES if bucket is None else bucket.available() + len(pending)
+                window = max(1, min(MAX_PARALLEL_PAGES, pages_needed, tokens))
+    finally:
+        # Enough products collected: drop the pages that were not started yet, make the ones
+        # still waiting for a token give up, and don't wait for the ones already sent
+        done.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if len(products) < nb_items and not complete:
+        # Not cached (see cache_policy.cached): the next search tries again
+        raise IncompleteSearch(cache_products(products if len(products) >= len(stored) else stored), nb_items)
 
     # Return the required number of products
-    return products[:nb_items]
+    return cache_products(products[:nb_items])
 
 
-def clean_prefixes(items):
-    formatted_items = []
-    for item in items:
-        # Remove prefix before the first colon
-        item_cleaned = re.sub(r'^.*?:', '', item)
-        
-        # Capitalize each part of the string, split by spaces or hyphens
-        formatted_item = ' '.join([part.capitalize() for part in re.split(r'[- ]', item_cleaned)])
-        
-        # Replace spaces with hyphens to maintain formatting (e.g., country code style)
-        formatted_item = formatted_item.replace(" ", "-")
-        
-        formatted_items.append(formatted_item)
-    
-    return formatted_items
+# Maximum number of sales maps kept in memory (one per set of countries and products)
+MAX_CACHED_MAPS = 64
 
 def display_sales_map(countries_data):
     if not countries_data:
         return
     
-    # Créer un dictionnaire pays -> produits
+    # Même panier que lors d'une exécution précédente : la carte n'est pas recalculée
+    fig = figure_for("sales_map", countries_data, sales_map_figure)
+    if fig is not None:
+        st.plotly_chart(fig, use_container_width=True)
+
+# Function to get the sales map of a list of products (None if no country is known)
+def sales_map_figure(countries_data):
+    # Créer un dictionnaire code ISO-3 -> (pays, produits)
     country_products = {}
     for product in countries_data:
         product_name = product.get('product_name', 'Unknown')
-        countries = product.get('countries_tags', [])
-        
-        cleaned_countries = clean_prefixes(countries)
-        for country in cleaned_countries:
-            if country not in country_products:
-                country_products[country] = []
-            country_products[country].append(product_name)
+        for tag in product.get('countries_tags', []):
+            code = iso3(tag)
+            if code is None:
+                continue  # Pas un pays (ex: "en:world")
+            if code not in country_products:
+                country_products[code] = (clean_tag(tag), [])
+            country_products[code][1].append(product_name)
     
+    if not country_products:
+        return None
+    
+    # La figure est construite une seule fois pour un même ensemble de pays et de produits
+    key = tuple(sorted((code, country, tuple(products)) for code, (country, products) in country_products.items()))
+    return build_sales_map(key)
+
+# Function to build the sales map from (ISO-3 code, country name, product names) tuples
+@lru_cache(maxsize=MAX_CACHED_MAPS)
+def build_sales_map(country_products):
+    import pandas as pd
+    import plotly.express as px
+
     # Créer le DataFrame pour Plotly
     df_countries = pd.DataFrame([
-        {'Country': country, 'Products': '<br>- '.join(products)}
-        for country, products in country_products.items()
+        {'ISO-3': code, 'Country': country, 'Products': '<br>- '.join(products)}
+        for code, country, products in country_products
     ])
     
-    # Créer la carte avec les infobulles personnalisées
+    # Créer la carte avec les infobulles personnalisées (pays identifiés par leur code ISO-3)
     fig = px.choropleth(
         df_countries,
-        locations='Country',
-        locationmode='country names',
+        locations='ISO-3',
+        locationmode='ISO-3',
         color='Country',
         hover_data=['Products'],
-        custom_data=['Products'],
+        custom_data=['Products', 'Country'],
         title="Sales Countries for Selected Products",
         template="plotly_white",
         color_continuous_scale='Viridis'
@@ -198,13 +267,15 @@ def display_sales_map(countries_data):
     
     # Personnaliser le format des infobulles
     fig.update_traces(
-        hovertemplate="<b>%{location}</b><br><br>" +
+        hovertemplate="<b>%{customdata[1]}</b><br><br>" +
         "Products sold:<br>- %{customdata[0]}<extra></extra>"
     )
     
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
 def display_sales_info_and_map(selected_products):
+    import pandas as pd
+
     # Afficher le tableau des pays
     countries_list = []
     for product in selected_products:
@@ -232,6 +303,8 @@ def display_sales_info_and_map(selected_products):
 
 # Function to display the sales countries table
 def display_sales_countries_table(selected_products):
+    import pandas as pd
+
     countries_list = []  # List to store sales countries
     
     # Iterate over each product in the cart
@@ -252,8 +325,21 @@ def display_sales_countries_table(selected_products):
     st.subheader("Sales Countries Table for Products")
     st.dataframe(df_countries)
         
+# Goals used by the RDA comparison chart
+RDA_GOALS = ("calories", "fat", "saturated_fat", "carbohydrates", "sugars", "proteins", "salt")
+
 # Function to generate a nutrient comparison chart with Recommended Daily Allowances (RDA)
 def plot_nutrient_rda_comparison_plotly(selected_products, goals):
+   # Only rebuilt when the cart or one of the goals used by the chart changes
+   relevant_goals = tuple(goals.get(goal) for goal in RDA_GOALS)
+   fig = figure_for("nutrient_rda", selected_products, nutrient_rda_figure, goals, key=relevant_goals)
+   st.plotly_chart(fig)
+
+# Function to build the nutrient comparison chart with Recommended Daily Allowances (RDA)
+def nutrient_rda_figure(selected_products, goals):
+   import pandas as pd
+   import plotly.express as px
+
    rda = {
        "Calories (kcal)": goals.get("calories", 2000),
        "Fat (g)": goals.get("fat", 70),
@@ -264,15 +350,16 @@ def plot_nutrient_rda_comparison_plotly(selected_products, goals):
        "Salt (g)": goals.get("salt", 6)
    }
 
-   # Calculate totals
+   # Totals kept up to date by the cart
+   cart_totals = nutrient_totals(selected_products)
    totals = {
-       "Calories": sum(p.get('nutriments', {}).get('energy-kcal', 0) for p in selected_products),
-       "Fat": sum(p.get('nutriments', {}).get('fat', 0) for p in selected_products),
-       "Saturated Fat": sum(p.get('nutriments', {}).get('saturated-fat', 0) for p in selected_products),
-       "Carbohydrates": sum(p.get('nutriments', {}).get('carbohydrates', 0) for p in selected_products),
-       "Sugars": sum(p.get('nutriments', {}).get('sugars', 0) for p in selected_products),
-       "Proteins": sum(p.get('nutriments', {}).get('proteins', 0) for p in selected_products),
-       "Salt": sum(p.get('nutriments', {}).get('salt', 0) for p in selected_products)
+       "Calories": cart_totals['energy-kcal'],
+       "Fat": cart_totals['fat'],
+       "Saturated Fat": cart_totals['saturated-fat'],
+       "Carbohydrates": cart_totals['carbohydrates'],
+       "Sugars": cart_totals['sugars'],
+       "Proteins": cart_totals['proteins'],
+       "Salt": cart_totals['salt']
    }
 
    comparison_data = {
@@ -303,30 +390,29 @@ def plot_nutrient_rda_comparison_plotly(selected_products, goals):
        barmode="group"
    )
 
-   st.plotly_chart(fig)
+   return fig
 
 # Function to generate a nutrient distribution chart for selected products
 def plot_nutrient_distribution_plotly(selected_products):
+   st.plotly_chart(figure_for("nutrient_distribution", selected_products, nutrient_distribution_figure))
+
+# Function to build the nutrient distribution chart
+def nutrient_distribution_figure(selected_products):
+   import pandas as pd
+   import plotly.express as px
+
+   # Totals kept up to date by the cart
+   cart_totals = nutrient_totals(selected_products)
    nutrient_data = {
-       "Energy (kcal)": 0,
-       "Fat (g)": 0, 
-       "Saturated Fat (g)": 0,
-       "Carbohydrates (g)": 0,
-       "Sugars (g)": 0,
-       "Proteins (g)": 0,
-       "Salt (g)": 0
+       "Energy (kcal)": cart_totals['energy-kcal'],
+       "Fat (g)": cart_totals['fat'], 
+       "Saturated Fat (g)": cart_totals['saturated-fat'],
+       "Carbohydrates (g)": cart_totals['carbohydrates'],
+       "Sugars (g)": cart_totals['sugars'],
+       "Proteins (g)": cart_totals['proteins'],
+       "Salt (g)": cart_totals['salt']
    }
 
-   for product in selected_products:
-       nutriments = product.get('nutriments', {})
-       nutrient_data["Energy (kcal)"] += nutriments.get('energy-kcal', 0)
-       nutrient_data["Fat (g)"] += nutriments.get('fat', 0)
-       nutrient_data["Saturated Fat (g)"] += nutriments.get('saturated-fat', 0)
-       nutrient_data["Carbohydrates (g)"] += nutriments.get('carbohydrates', 0)
-       nutrient_data["Sugars (g)"] += nutriments.get('sugars', 0)
-       nutrient_data["Proteins (g)"] += nutriments.get('proteins', 0)
-       nutrient_data["Salt (g)"] += nutriments.get('salt', 0)
-
    df = pd.DataFrame(nutrient_data, index=[0]).T
    df.columns = ["Total"]
 
@@ -353,40 +439,28 @@ def plot_nutrient_distribution_plotly(selected_products):
         legend_title="Nutrients"
    )
 
-   st.plotly_chart(fig)
+   return fig
 
 # Function to create a comparison chart of nutrients for each product
 def create_nutrient_comparison(products):
-    # List of nutrients we want to compare
-    nutrients = [
-        'energy-kcal', 'fat', 'saturated-fat', 'carbohydrates', 
-        'sugars', 'fiber', 'proteins', 'salt'
-    ]
-    
-    data = []  # Initialize an empty list to store the product data
-    
-    # Loop through each product to extract its nutrient data
-    for product in products:
-        nutriments = product.get('nutriments', {})  # Get the nutrient data for the product
-        product_data = {
-            'Product': product.get('product_name', 'Unknown'),  # Get the product name (default to 'Unknown' if missing)
-            **{nutrient: nutriments.get(nutrient, 0) for nutrient in nutrients}  # Add each nutrient's value, defaulting to 0 if not available
-        }
-        data.append(product_data)  # Append the product's data to the list
+    import numpy as np
+    import plotly.graph_objects as go
+
+    # List of nutrients we want to compare (the columns of the cart matrix)
+    nutrients = list(NUTRIENT_KEYS)
     
-    # Convert the data into a DataFrame for easier manipulation
-    df = pd.DataFrame(data)
+    # One row per product, missing nutrients shown as 0
+    values = np.nan_to_num(nutrient_matrix(products))
     
     fig = go.Figure()  # Initialize a plotly figure
     
-    # Loop through each unique product to plot the bar charts
-    for product in df['Product'].unique():
-        product_data = df[df['Product'] == product]  # Filter the DataFrame for the current product
+    # One bar trace per product, read from its row of the matrix
+    for row, product in enumerate(products):
         fig.add_trace(go.Bar(
-            name=product,  # Name of the trace is the product name
+            name=product.get('product_name', 'Unknown'),  # Name of the trace is the product name
             x=nutrients,  # X-axis is the list of nutrients
-            y=product_data[nutrients].values.flatten(),  # Y-axis is the nutrient values for the current product
-            text=product_data[nutrients].values.flatten(),  # Display the nutrient values as text on the bars
+            y=values[row],  # Y-axis is the nutrient values for the current product
+            text=values[row],  # Display the nutrient values as text on the bars
             textposition='auto',  # Automatically position the text on the bars
         ))
 
@@ -414,6 +488,8 @@ def convert_letter_score_to_number(letter):
 
 # Function to create a radar chart comparing the Nutriscore, Ecoscore, and NOVA scores of selected products
 def create_radar_comparison(products):
+    import plotly.graph_objects as go
+
     data = []  # List to store the processed data for each product
     
     # Loop through each product and extract its scores
@@ -456,25 +532,56 @@ def create_radar_comparison(products):
     # Return the figure to be displayed
     return fig
 
-# Function to get recipes by a specific ingredient
-@st.cache_data
+# Function to split the ingredients typed by the user ("chicken, garlic" -> ["chicken", "garlic"])
+def parse_ingredients(text):
+    return [name.strip() for name in text.split(",") if name.strip()]
+
+# Function to get recipes using one or several ingredients (comma-separated)
+@cached
 def get_recipes_by_ingredient(ingredient):
-    # API URL to filter meals by ingredient
-    url = f"https://www.themealdb.com/api/json/v1/1/filter.php?i={ingredient}"
-    response = requests.get(url)  # Sending GET request to the API
-    if response.status_code == 200:  # Check if the request is successful
-        data = response.json()  # Parse the JSON response
-        # Return the list of meals or a message if no meals are found
-        return data["meals"] if data["meals"] else "No recipe found for this ingredient."
-    # Return an error message if the API request fails
-    return f"Error: {response.status_code}"
+    from http_client import http_get
+
+    ingredients = parse_ingredients(ingredient)
+
+    # Local MealDB mirror: one query on the ingredient index, without any request
+    if meal_store.is_available():
+        meals = meal_store.find_meals(ingredients)
+        if meals:
+            return meals
+        # Nothing found in the mirror: ask the API (the mirror may be older than the catalog)
+
+    # Otherwise, one filter request per ingredient, keeping the meals found for every ingredient
+    meals = None
+    for name in ingredients:
+        # API URL to filter meals by ingredient
+        url = f"https://www.themealdb.com/api/json/v1/1/filter.php?i={name}"
+        response = http_get(url)  # Sending GET request to the API
+        if response.status_code != 200:  # Check if the request is successful
+            # Return an error message if the API request fails
+            return f"Error: {response.status_code}"
+        found = response.json()["meals"] or []  # Parse the JSON response
+        if meals is None:
+            meals = found
+        else:
+            ids = {meal["idMeal"] for meal in found}
+            meals = [meal for meal in meals if meal["idMeal"] in ids]
+    # Return the list of meals or a message if no meals are found
+    return meals if meals else "No recipe found for this ingredient."
 
 # Function to get detailed information about a specific recipe
-@st.cache_data
+@cached
 def get_recipe_details(recipe_id):
+    from http_client import http_get
+
+    # Local MealDB mirror first
+    if meal_store.is_available():
+        meal = meal_store.get_meal(recipe_id)
+        if meal is not None:
+            return meal
+
     # API URL to get detailed information about a recipe using its ID
     url = f"https://www.themealdb.com/api/json/v1/1/lookup.php?i={recipe_id}"
-    response = requests.get(url)  # Sending GET request to the API
+    response = http_get(url)  # Sending GET request to the API
     if response.status_code == 200:  # Check if the request is successful
         data = response.json()  # Parse the JSON response
         # Return the details of the recipe or None if no details are found
@@ -482,75 +589,125 @@ def get_recipe_details(recipe_id):
     # Return None if the API request fails
     return None
 
+# Function to find the MealDB ingredient of each product of the cart (needs the local mirror).
+# The product name is tried first, then its categories; products without a match are left out.
+def cart_ingredients(products):
+    known = meal_store.ingredient_names()
+    ingredients = []
+    for product in products:
+        name = meal_store.match_ingredient(product.get('product_name'), known) or meal_store.match_ingredient(product.get('categories'), known)
+        if name and name not in ingredients:
+            ingredients.append(name)
+    return ingredients
+
+# Maximum number of recipe details fetched at the same time
+MAX_PARALLEL_RECIPES = 8
+
+# Function to fetch the details of several recipes concurrently.
+# Yields (index, details) as soon as each lookup completes, so the page can fill
+# the card of each recipe without waiting for the slowest one. The lookups run in
+# worker threads and never call Streamlit: only the caller renders.
+# With thumbnail_width, the workers also put the recipe thumbnail in the image cache.
+def iter_recipe_details(recipes, thumbnail_width=None):
+    def fetch(recipe):
+        details = get_recipe_details(recipe["idMeal"])
+        if details and thumbnail_width:
+            import image_cache
+
+            image_cache.thumbnail(recipe.get("strMealThumb"), thumbnail_width)
+        return details
+
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_RECIPES) as executor:
+        futures = {executor.submit(fetch, recipe): index for index, recipe in enumerate(recipes)}
+        for future in as_completed(futures):
+            try:
+                details = future.result()
+            except Exception:
+                details = None  # A failed lookup only hides its own card
+            yield futures[future], details
+
+
+# Nutrients extracted by process_products (per 100 g)
+SELECTED_NUTRIENTS = [
+    'energy-kcal_100g',
+    'fat_100g',
+    'saturated-fat_100g',
+    'carbohydrates_100g',
+    'sugars_100g',
+    'fiber_100g',
+    'proteins_100g',
+    'salt_100g'
+]
+
+# Function to build the DataFrame of processed products, one column at a time
+def build_products_frame(products):
+    import pandas as pd
+
+    nutriments = [product.get("nutriments", {}) for product in products]
+
+    # Basic product information (name, code, URL, etc.)
+    columns = {
+        "product_name": [product.get("product_name", "Unknown") for product in products],
+        "code": [product.get("code", "Unknown") for product in products],
+        "url": [product.get("url", "#") for product in products],
+        "quantity": [product.get("quantity", "Information not available") for product in products],
+        "categories": clean_tag_column([product.get("categories", "") for product in products]),
+        "origins": clean_tag_column([product.get("origins", "") for product in products]),
+        "nutriscore_grade": [product.get("nutriscore_grade", "Not available").upper() for product in products],
+        "ecoscore_grade": [product.get("ecoscore_grade", "Not available").upper() for product in products],
+        "nova_group": [product.get("nova_group", "Not available") for product in products],
+        "nutrition_data_per": [product.get("nutrition_data_per", "Not available") for product in products],
+        "image_url": [product.get("image_front_small_url", None) for product in products]
+    }
+
+    # Nutrient values, with a readable column name (e.g. 'saturated-fat_100g' -> 'Saturated fat')
+    for nutrient_key in SELECTED_NUTRIENTS:
+        nutrient_name = nutrient_key.replace('_100g', '').replace('_unit', '').replace('-', ' ').capitalize()
+        columns[nutrient_name] = [values.get(nutrient_key) for values in nutriments]
+
+    # Cleaned allergens, labels and countries of sale
+    columns["allergens"] = clean_tag_column([product.get("allergens", "") for product in products])
+    columns["labels"] = clean_tag_column([product.get("labels", "") for product in products])
+    columns["countries"] = clean_tag_column([product.get("countries_tags", []) for product in products], split=False)
 
-# Use @st.cache_data to cache the processing of products
-@st.cache_data
+    if not products:
+        return pd.DataFrame()
+    return pd.DataFrame(columns)
+
+# Cache the processing of products (see cache_policy.CACHE_POLICIES)
+@cached
 def process_products(products):
-    processed_data = []  # List to store processed product data
-    
-    # Iterate through each product in the input list
-    for product in products:
-        # Extract basic product information (name, code, URL, etc.)
-        product_data = {
-            "product_name": product.get("product_name", "Unknown"),
-            "code": product.get("code", "Unknown"),
-            "url": product.get("url", "#"),
-            "quantity": product.get("quantity", "Information not available"),
-            "categories": product.get("categories", "Information not available"),
-            "origins": product.get("origins", "Information not available"),
-            "nutriscore_grade": product.get("nutriscore_grade", "Not available").upper(),
-            "ecoscore_grade": product.get("ecoscore_grade", "Not available").upper(),
-            "nova_group": product.get("nova_group", "Not available"),
-            "nutrition_data_per": product.get("nutrition_data_per", "Not available"),
-            "image_url": product.get("image_front_small_url", None)
-        }
-        
-        # List of specific nutrients to extract
-        selected_nutrients = [
-            'energy-kcal_100g',
-            'fat_100g',
-            'saturated-fat_100g',
-            'carbohydrates_100g',
-            'sugars_100g',
-            'fiber_100g',
-            'proteins_100g',
-            'salt_100g'
-        ]
-        
-        # Extracting nutrient values from the product's 'nutriments' field
-        nutriments = product.get("nutriments", {})
-        for nutrient_key in selected_nutrients:
-            nutrient_value = nutriments.get(nutrient_key)
-            # Transform the nutrient name for better readability in the DataFrame
-            nutrient_name = nutrient_key.replace('_100g', '').replace('_unit', '').replace('-', ' ').capitalize()
-            product_data[nutrient_name] = nutrient_value
-        
-        # Clean and process allergens and labels
-        allergens = product.get("allergens", "")
-        product_data["allergens"] = ", ".join(clean_prefixes(allergens.split(","))) if allergens else "Not available"
-        
-        labels = product.get("labels", "")
-        product_data["labels"] = ", ".join(clean_prefixes(labels.split(","))) if labels else "Not available"
+    return build_products_frame(products)
 
-        # Clean and process categories and origins
-        categories = product.get("categories", "")
-        product_data["categories"] = ", ".join(clean_prefixes(categories.split(","))) if categories else "Not available"
-        
-        origins = product.get("origins", "")
-        product_data["origins"] = ", ".join(clean_prefixes(origins.split(","))) if origins else "Not available"
-        
-        # Clean and process countries of sale
-        countries = product.get("countries_tags", [])
-        product_data["countries"] = ", ".join(clean_prefixes(countries)) if countries else "Not available"
-        
-        # Add the processed product data to the list
-        processed_data.append(product_data)
-    
-    # Convert the list of product data into a DataFrame and return it
-    return pd.DataFrame(processed_data)
+
+# Function to get the processed DataFrame of a category, from the on-disk cache when possible
+def get_category_frame(category, nb_items=20):
+    from category_cache import load_category_frame, save_category_frame
+
+    df_cached = load_category_frame(category)
+    if df_cached is not None and len(df_cached) >= nb_items:
+        return df_cached.head(nb_items).copy()
+
+    # Not cached (or not enough products cached): fetch and cache the category
+    try:
+        products = search_product_by_category(category, nb_items)
+    except IncompleteSearch as e:
+        # Show what could be fetched, without caching it
+        st.warning(str(e))
+        return process_products(e.products)
+    df_processed = process_products(products)
+    if not df_processed.empty:
+        save_category_frame(category, df_processed)
+    return df_processed
 
 
 def plot_label_distribution(selected_products):
+    st.plotly_chart(figure_for("label_distribution", selected_products, label_distribution_figure))
+
+# Function to build the pie chart of the dietary labels
+def label_distribution_figure(selected_products):
+    import plotly.express as px
+
     specific_labels = ["No gluten", "Vegetarian", "Vegan"]
     label_counts = {label: 0 for label in specific_labels}
     label_products = {label: [] for label in specific_labels}
@@ -606,4 +763,4 @@ def plot_label_distribution(selected_products):
         legend_title="Dietary Requirments"
     )
 
-    st.plotly_chart(fig)
+    return fig
@@ -0,0 +1,118 @@
+# http_client.py
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import response_cache
+from rate_limiter import MAX_BACKOFF, MAX_RETRIES, RETRY_STATUSES, bucket_for, retry_delay
+
+# Default timeout (in seconds) for every request: (connect, read)
+DEFAULT_TIMEOUT = (5, 15)
+
+# Number of hosts we keep a connection pool for, and number of
+# keep-alive connections kept open per host
+POOL_HOSTS = 10
+POOL_SIZE_PER_HOST = 16
+
+# Headers sent with every request
+DEFAULT_HEADERS = {
+    'User-Agent': 'Projet_OpenData/1.0 (Streamlit food dashboard)',
+    'Accept': 'application/json',
+    'Accept-Encoding': 'gzip, deflate'
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+# Function to get the process-wide HTTP session (created on first use)
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers.update(DEFAULT_HEADERS)
+
+                # One connection pool per host, with keep-alive connections reused
+                # across requests instead of a new TCP+TLS handshake each time
+                adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_SIZE_PER_HOST)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+
+                _session = session
+    return _session
+
+# Function to send a GET request through the shared session.
+# Requests wait for the rate limiter of their host, and transient errors
+# (429, 5xx) are retried with Retry-After or exponential backoff.
+# With cache=True, successful responses are kept in the persistent response cache:
+# fresh entries are served without any request, stale ones are revalidated
+# (304 Not Modified) and served as they are if the server can't be reached.
+# If no token of the rate limiter can be had within `max_wait` seconds (see TokenBucket.acquire),
+# or `cancelled` is set while waiting, the request isn't sent: the stale copy is served if
+# there is one, else a 429 response.
+def http_get(url, params=None, headers=None, timeout=DEFAULT_TIMEOUT, cache=True, cancelled=None, max_wait=None):
+    entry = None
+    if cache:
+        key = response_cache.cache_key(url, params)
+        entry = response_cache.lookup(key)
+        if entry is not None and entry["fresh"]:
+            response_cache.touch(entry)
+            return response_cache.to_response(entry)
+        if entry is not None:
+            headers = {**(headers or {}), **response_cache.conditional_headers(entry)}
+
+    try:
+        response = _send(url, params, headers, timeout, cancelled, max_wait)
+    except requests.RequestException:
+        # Network error: fall back to the stale copy if we have one
+        if entry is None:
+            raise
+        return response_cache.to_response(entry)
+
+    if cache:
+        if response.status_code == 304 and entry is not None:
+            response_cache.revalidated(entry, response)
+            return response_cache.to_response(entry)
+        if response.status_code == 200:
+            response_cache.store(key, response.url or url, response)
+        elif entry is not None and response.status_code in RETRY_STATUSES:
+            # Still rate limited or unavailable after the retries: serve the stale copy
+            return response_cache.to_response(entry)
+    return response
+
+# Function to send a request, waiting for the rate limiter and retrying transient errors
+def _send(url, params, headers, timeout, cancelled=None, max_wait=None):
+    bucket = bucket_for(url)
+    attempt = 0
+    while True:
+        if bucket is not None and not bucket.acquire(max_wait, cancelled):
+            return rate_limited_response(url)
+        response = get_session().get(url, params=params, headers=headers, timeout=timeout)
+
+        if response.status_code not in RETRY_STATUSES:
+            return response
+
+        delay = retry_delay(response, attempt)
+        if response.status_code == 429 and bucket is not None:
+            # The server asked us to slow down: hold back every session, not just this one
+            bucket.pause(delay)
+
+        # Give up if we ran out of attempts or the server asks for too long a wait
+        if attempt >= MAX_RETRIES or delay > MAX_BACKOFF:
+            return response
+
+        time.sleep(delay)
+        attempt += 1
+
+# Function to build the response of a request given up before it was sent (no token in time)
+def rate_limited_response(url):
+    response = requests.Response()
+    response.status_code = 429
+    response.reason = "Too Many Requests (rate limit wait exceeded)"
+    response.url = url
+    response._content = b""
+    return response
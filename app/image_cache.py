@@ -0,0 +1,209 @@
+# image_cache.py
+#
+# Local cache of product and recipe images, served as right-sized thumbnails.
+# Each remote image is downloaded once; the thumbnails the pages ask for (150, 200, 300 px
+# wide) are made from it with Pillow and kept as small JPEG files under data/images.
+# The cache is bounded in bytes: the least recently used files are removed first.
+# Missing or broken images are replaced by a placeholder, and are not downloaded again
+# before FAILED_RETRY_AFTER.
+
+import hashlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from http_client import http_get
+from storage import DATA_DIR
+
+# Location and maximum size of the cache (can be overridden with IMAGE_CACHE_DIR and IMAGE_CACHE_MB)
+CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", os.path.join(DATA_DIR, "images"))
+MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MB", "200")) * 1024 * 1024
+
+# Thumbnail widths used by the pages
+THUMBNAIL_WIDTHS = (150, 200, 300)
+
+# JPEG quality of the thumbnails
+JPEG_QUALITY = 85
+
+# How long (in seconds) an image that couldn't be downloaded or read is replaced by the
+# placeholder before being tried again
+FAILED_RETRY_AFTER = 3600
+
+# Maximum number of images downloaded at the same time
+MAX_PARALLEL_DOWNLOADS = 6
+
+# Background of the placeholder and of transparent images
+BACKGROUND = (255, 255, 255)
+PLACEHOLDER_COLOR = (238, 238, 238)
+PLACEHOLDER_TEXT_COLOR = (150, 150, 150)
+
+_lock = threading.Lock()
+_total_bytes = None  # Size of the cache directory, computed on first use
+_placeholders = {}
+
+# Function to get the path of a cached file (the original image, or one of its thumbnails)
+def cache_path(url, width=None):
+    name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    folder = "originals" if width is None else str(width)
+    return os.path.join(CACHE_DIR, folder, name[:2], name if width is None else f"{name}.jpg")
+
+# Function to get the path of the empty file marking an image that couldn't be downloaded or read
+def failed_path(url):
+    name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, "failed", name[:2], name)
+
+# Function to check if an image failed less than FAILED_RETRY_AFTER ago
+def failed_recently(url):
+    try:
+        return time.time() - os.stat(failed_path(url)).st_mtime < FAILED_RETRY_AFTER
+    except OSError:
+        return False
+
+# Function to remember that an image couldn't be downloaded or read (e.g. 404, timeout, not an image)
+def mark_failed(url):
+    write_cached(failed_path(url), b"")
+
+# Function to get the placeholder shown instead of a missing image (a grey square)
+def placeholder(width):
+    if width not in _placeholders:
+        # Pillow is only loaded when an image has to be drawn (cached thumbnails are read as bytes)
+        from PIL import Image, ImageDraw
+
+        image = Image.new("RGB", (width, width), PLACEHOLDER_COLOR)
+        draw = ImageDraw.Draw(image)
+        text = "No image"
+        left, top, right, bottom = draw.textbbox((0, 0), text)
+        draw.text(((width - (right - left)) / 2, (width - (bottom - top)) / 2), text, fill=PLACEHOLDER_TEXT_COLOR)
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=JPEG_QUALITY)
+        _placeholders[width] = buffer.getvalue()
+    return _placeholders[width]
+
+# Function to read a cached file and mark it as recently used (None if not cached)
+def read_cached(path):
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except OSError:
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return data
+
+# Function to write a file into the cache, then evict the least recently used files if needed
+def write_cached(path, data):
+    global _total_bytes
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{threading.get_ident()}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(data)
+    os.replace(temporary, path)
+
+    with _lock:
+        if _total_bytes is None:
+            _total_bytes = sum(size for _, size, _ in iter_files())
+        else:
+            _total_bytes += len(data)
+        if _total_bytes > MAX_BYTES:
+            evict()
+
+# Function to list the cached files as (path, size, last access)
+def iter_files():
+    for root, _, names in os.walk(CACHE_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            yield path, stat.st_size, stat.st_mtime
+
+# Function to remove the least recently used files until the cache is back under 90% of MAX_BYTES
+# (called with _lock held)
+def evict():
+    global _total_bytes
+    files = sorted(iter_files(), key=lambda file: file[2])
+    _total_bytes = sum(size for _, size, _ in files)
+    for path, size, _ in files:
+        if _total_bytes <= MAX_BYTES * 0.9:
+            break
+        try:
+            os.remove(path)
+            _total_bytes -= size
+        except OSError:
+            pass
+
+# Function to get the original image of a URL, downloading it only once (None if it can't be fetched)
+def get_original(url):
+    path = cache_path(url)
+    data = read_cached(path)
+    if data is None:
+        try:
+            response = http_get(url, headers={"Accept": "image/*"}, cache=False)
+        except Exception:
+            return None
+        if response.status_code != 200 or not response.content:
+            return None
+        data = response.content
+        write_cached(path, data)
+    return data
+
+# Function to make a JPEG thumbnail `width` pixels wide (never enlarging the image)
+def make_thumbnail(data, width):
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail((width, width * 4), Image.LANCZOS)
+        # Transparent images get a white background
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, BACKGROUND)
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True)
+        return buffer.getvalue()
+
+# Function to get the thumbnail of an image as JPEG bytes (a placeholder if the image is missing),
+# ready to be passed to st.image
+def thumbnail(url, width=150):
+    if not url:
+        return placeholder(width)
+
+    path = cache_path(url, width)
+    data = read_cached(path)
+    if data is not None:
+        return data
+
+    # Don't try again an image that failed recently (each try may block the page up to the timeout)
+    if failed_recently(url):
+        return placeholder(width)
+
+    original = get_original(url)
+    if original is None:
+        mark_failed(url)
+        return placeholder(width)
+    try:
+        data = make_thumbnail(original, width)
+    except Exception:
+        # Not an image (or a truncated one): no need to keep it
+        try:
+            os.remove(cache_path(url))
+        except OSError:
+            pass
+        mark_failed(url)
+        return placeholder(width)
+    write_cached(path, data)
+    return data
+
+# Function to get the thumbnails of several images, downloading the missing ones concurrently
+def thumbnails(urls, width=150):
+    urls = list(urls)
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_DOWNLOADS) as executor:
+        return list(executor.map(lambda url: thumbnail(url, width), urls))
@@ -0,0 +1,161 @@
+# meal_store.py
+#
+# Local mirror of TheMealDB (SQLite), with an ingredient -> meal index.
+# The whole catalog is a few hundred meals, so it is pulled once with:
+#
+#     python app/meal_store.py sync
+#
+# Once the mirror exists, the recipe functions of the app read from it instead of the network,
+# and recipes using several ingredients at once are found with a single query.
+
+import argparse
+import json
+import os
+import re
+import string
+import time
+
+from storage import DATA_DIR, connect
+
+# Location of the mirror (can be overridden with the MEALDB_STORE_PATH environment variable)
+STORE_PATH = os.environ.get("MEALDB_STORE_PATH", os.path.join(DATA_DIR, "mealdb.db"))
+
+# MealDB returns every meal whose name starts with a given letter
+SEARCH_URL = "https://www.themealdb.com/api/json/v1/1/search.php"
+
+# Number of ingredient slots of a meal (strIngredient1 ... strIngredient20)
+INGREDIENT_SLOTS = 20
+
+# Longest ingredient name (in words) looked for in a product name
+MAX_INGREDIENT_WORDS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meals (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    thumb TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meal_ingredients (
+    ingredient TEXT NOT NULL,
+    meal_id TEXT NOT NULL,
+    PRIMARY KEY (ingredient, meal_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS meal_ingredients_meal ON meal_ingredients (meal_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    synced_at REAL NOT NULL,
+    meals INTEGER NOT NULL
+);
+"""
+
+# Function to get the connection of the current thread to the store
+def get_connection(path=None):
+    return connect(path or STORE_PATH, SCHEMA)
+
+_synced = set()  # Mirrors known to hold a completed sync
+
+# Function to check if the mirror has been synced: the whole catalog must have been pulled
+# (a sync that failed partway leaves a database holding a few letters only)
+def is_available(path=None):
+    path = path or STORE_PATH
+    if path in _synced:
+        return True
+    if not os.path.exists(path):
+        return False
+    if get_connection(path).execute("SELECT 1 FROM sync_state").fetchone() is None:
+        return False
+    _synced.add(path)
+    return True
+
+# Function to normalise an ingredient name ("Chicken_Breast " -> "chicken breast")
+def normalise_ingredient(name):
+    return " ".join(name.replace("_", " ").lower().split())
+
+# Function to get the normalised ingredients of a meal
+def meal_ingredients(meal):
+    ingredients = set()
+    for i in range(1, INGREDIENT_SLOTS + 1):
+        name = normalise_ingredient(meal.get(f"strIngredient{i}") or "")
+        if name:
+            ingredients.add(name)
+    return ingredients
+
+# Function to insert or update a batch of meals (matched by id) and their ingredients
+def upsert_meals(meals, path=None):
+    connection = get_connection(path)
+    rows = [(meal["idMeal"], meal["strMeal"], meal.get("strMealThumb"), json.dumps(meal, ensure_ascii=False)) for meal in meals]
+    with connection:
+        connection.executemany("INSERT OR REPLACE INTO meals (id, name, thumb, data) VALUES (?, ?, ?, ?)", rows)
+        connection.executemany("DELETE FROM meal_ingredients WHERE meal_id = ?", [(row[0],) for row in rows])
+        connection.executemany(
+            "INSERT OR IGNORE INTO meal_ingredients (ingredient, meal_id) VALUES (?, ?)",
+            [(ingredient, meal["idMeal"]) for meal in meals for ingredient in meal_ingredients(meal)]
+        )
+    return len(rows)
+
+# Function to pull the whole catalog, one first letter at a time
+def sync_meals(path=None, progress=print):
+    from http_client import http_get  # Only loaded to sync (requests is slow to import)
+
+    total = 0
+    for letter in string.ascii_lowercase:
+        # Always from the network: the sync is how the mirror gets new meals
+        response = http_get(SEARCH_URL, params={"f": letter}, cache=False)
+        response.raise_for_status()
+        total += upsert_meals(response.json().get("meals") or [], path)
+        if progress:
+            progress(f"{letter}: {total} meals")
+
+    with get_connection(path) as connection:
+        connection.execute("INSERT OR REPLACE INTO sync_state (id, synced_at, meals) VALUES (1, ?, ?)", (time.time(), total))
+    return total
+
+# Function to get the full details of a meal (None if unknown)
+def get_meal(meal_id, path=None):
+    row = get_connection(path).execute("SELECT data FROM meals WHERE id = ?", (str(meal_id),)).fetchone()
+    return json.loads(row[0]) if row else None
+
+# Function to find the meals using every ingredient of a list, in the same shape as filter.php
+def find_meals(ingredients, path=None):
+    ingredients = sorted({normalise_ingredient(name) for name in ingredients} - {""})
+    if not ingredients:
+        return []
+    placeholders = ", ".join("?" * len(ingredients))
+    rows = get_connection(path).execute(
+        f"""SELECT m.id, m.name, m.thumb FROM meals m JOIN (
+                SELECT meal_id FROM meal_ingredients WHERE ingredient IN ({placeholders})
+                GROUP BY meal_id HAVING COUNT(*) = ?
+            ) i ON i.meal_id = m.id
+            ORDER BY m.name""",
+        ingredients + [len(ingredients)]
+    )
+    return [{"idMeal": meal_id, "strMeal": name, "strMealThumb": thumb} for meal_id, name, thumb in rows]
+
+# Function to get every ingredient used by at least one meal
+def ingredient_names(path=None):
+    return {name for (name,) in get_connection(path).execute("SELECT DISTINCT ingredient FROM meal_ingredients")}
+
+# Function to find the ingredient a text refers to ("Organic Chicken Breast Fillets" -> "chicken breast"):
+# the longest known ingredient appearing as whole words, or None
+def match_ingredient(text, known=None, path=None):
+    known = ingredient_names(path) if known is None else known
+    words = re.findall(r"\w+", (text or "").lower())
+    for size in range(MAX_INGREDIENT_WORDS, 0, -1):
+        for start in range(len(words) - size + 1):
+            candidate = " ".join(words[start:start + size])
+            if candidate in known:
+                return candidate
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local TheMealDB mirror")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sync_parser = subparsers.add_parser("sync", help="Pull every meal of TheMealDB")
+    sync_parser.add_argument("--store", default=None, help=f"Store path (default: {STORE_PATH})")
+
+    args = parser.parse_args()
+    if args.command == "sync":
+        print(f"Done: {sync_meals(args.store)} meals in {args.store or STORE_PATH}")
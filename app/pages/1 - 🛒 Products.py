@@ -1,7 +1,10 @@
 # pages/1 - 🛒 Products.py
 
 import streamlit as st
-from functions import initialize_session_state, show_cart_sidebar, search_product, search_product_by_category
+from functions import initialize_session_state, show_cart_sidebar, search_product, search_product_by_category, CATEGORIES, IncompleteSearch
+from product_cache import to_records
+from image_cache import thumbnails
+from cart import MAX_CART_SIZE
 
 # Initialize the session state
 initialize_session_state()
@@ -23,36 +26,45 @@ search_mode = st.radio("", ["🔍 By name", "📂 By category"], horizontal=True
 if search_mode == "🔍 By name":
     product_search_query = st.text_input("Enter product name")
     if st.button("Search", key="search_by_name"):
-        st.session_state.search_results = search_product(product_search_query)
+        # Keep only references to the shared compact product records in the session
+        st.session_state.search_results = to_records(search_product(product_search_query))
 
 # Handling "By category" search mode
 elif search_mode == "📂 By category":
     category = st.selectbox(
         "Select a category", 
-        ["Snacks", "Cereals and Potatoes", "Fruits", "Vegetables", "Dairy", "Beverages", "Waters"]
+        CATEGORIES
     )
     if st.button("Search", key="search_by_category"):
-        st.session_state.search_results = search_product_by_category(category)
+        try:
+            products = search_product_by_category(category)
+        except IncompleteSearch as e:
+            # Show the products that could be fetched, and why there are not more
+            st.warning(str(e))
+            products = e.products
+        st.session_state.search_results = to_records(products)
 
 # If there are search results, display them
 if st.session_state.search_results:
     columns = st.columns(3)
-    for index, product in enumerate(st.session_state.search_results[:10]):
+    displayed_products = st.session_state.search_results[:10]
+    # Local thumbnails of the displayed products (the missing ones are downloaded concurrently)
+    images = thumbnails([product.get('image_url') for product in displayed_products], 150)
+    for index, product in enumerate(displayed_products):
         with columns[index % 3]:
             product_name = product.get('product_name', 'Unknown')
             st.write(f"### {product_name}")
             
-            if image_url := product.get('image_url'):
-                st.image(image_url, width=150)
+            st.image(images[index], width=150)
             
             # Button to add the product to the cart
             if st.button(f"Add {product_name}", key=f"add_product_{index}", use_container_width=True):
-                if len(st.session_state.selected_products) < 5:
+                if not st.session_state.selected_products.is_full():
                     st.session_state.selected_products.append(product)
                     st.success(f"{product_name} added")
                     st.rerun()
                 else:
-                    st.warning("Maximum 5 products")
+                    st.warning(f"Maximum {MAX_CART_SIZE} products")
                     st.rerun()
 
 # Page styling with CSS
@@ -2,6 +2,7 @@
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 
 from functions import (
     initialize_session_state, 
@@ -9,6 +10,10 @@ from functions import (
     create_nutrient_comparison,
     create_radar_comparison
 )
+from image_cache import thumbnail
+from figure_cache import figure_for
+from cart import nutrient_matrix
+from product_record import NUTRIENT_KEYS
 
 # Initialize session state
 initialize_session_state()
@@ -31,7 +36,7 @@ else:
         for idx, product in enumerate(st.session_state.selected_products):
             with col1 if idx % 2 == 0 else col2:
                 st.subheader(product.get('product_name', 'Unknown'))
-                st.image(product.get('image_url', 'placeholder.png'), width=200)
+                st.image(thumbnail(product.get('image_url'), 200), width=200)
                 
                 # Display scores
                 scores_col1, scores_col2, scores_col3 = st.columns(3)
@@ -42,34 +47,33 @@ else:
                 with scores_col3:
                     st.metric("NOVA", product.get('nova_group', '?'))
     
-    # Display comparison charts
-    st.plotly_chart(create_nutrient_comparison(st.session_state.selected_products))
-    st.plotly_chart(create_radar_comparison(st.session_state.selected_products))
+    # Display comparison charts (only rebuilt when the products of the cart change)
+    st.plotly_chart(figure_for("nutrient_comparison", st.session_state.selected_products, create_nutrient_comparison))
+    st.plotly_chart(figure_for("radar_comparison", st.session_state.selected_products, create_radar_comparison))
     
-    # Detailed comparison table
-    comparison_data = []
-    for product in st.session_state.selected_products:
-        nutriments = product.get('nutriments', {})
-        comparison_data.append({
-            'Product': product.get('product_name', 'Unknown'),
-            'Energy': f"{nutriments.get('energy-kcal', 0):.1f} kcal",
-            'Fat': f"{nutriments.get('fat', 0):.1f}g",
-            'Saturated fat': f"{nutriments.get('saturated-fat', 0):.1f}g",
-            'Carbohydrates': f"{nutriments.get('carbohydrates', 0):.1f}g",
-            'Sugars': f"{nutriments.get('sugars', 0):.1f}g",
-            'Fiber': f"{nutriments.get('fiber', 0):.1f}g",
-            'Proteins': f"{nutriments.get('proteins', 0):.1f}g",
-            'Salt': f"{nutriments.get('salt', 0):.2f}g",
-            'Price': product.get('price', 'N/A'),
-            'Origin': product.get('origins', 'N/A'),
-            'Brand': product.get('brands', 'N/A'),
-            'Categories': product.get('categories', 'N/A'),
-            'Labels': product.get('labels', 'N/A'),
-            'Nutriscore': product.get('nutriscore_grade', '?').upper(),
-            'Ecoscore': product.get('ecoscore_grade', '?').upper(),
-            'NOVA': product.get('nova_group', '?')
-        })
+    # Detailed comparison table: nutrient columns are formatted from the cart matrix (missing values shown as 0)
+    products = st.session_state.selected_products
+    values = pd.DataFrame(np.nan_to_num(nutrient_matrix(products)), columns=NUTRIENT_KEYS)
+    comparison_table = pd.DataFrame({
+        'Product': [product.get('product_name', 'Unknown') for product in products],
+        'Energy': values['energy-kcal'].map("{:.1f} kcal".format),
+        'Fat': values['fat'].map("{:.1f}g".format),
+        'Saturated fat': values['saturated-fat'].map("{:.1f}g".format),
+        'Carbohydrates': values['carbohydrates'].map("{:.1f}g".format),
+        'Sugars': values['sugars'].map("{:.1f}g".format),
+        'Fiber': values['fiber'].map("{:.1f}g".format),
+        'Proteins': values['proteins'].map("{:.1f}g".format),
+        'Salt': values['salt'].map("{:.2f}g".format),
+        'Price': [product.get('price', 'N/A') for product in products],
+        'Origin': [product.get('origins', 'N/A') for product in products],
+        'Brand': [product.get('brands', 'N/A') for product in products],
+        'Categories': [product.get('categories', 'N/A') for product in products],
+        'Labels': [product.get('labels', 'N/A') for product in products],
+        'Nutriscore': [product.get('nutriscore_grade', '?').upper() for product in products],
+        'Ecoscore': [product.get('ecoscore_grade', '?').upper() for product in products],
+        'NOVA': [product.get('nova_group', '?') for product in products]
+    })
     
     # Display detailed comparison table
     st.subheader("Detailed Comparison Table")
-    st.dataframe(pd.DataFrame(comparison_data))
+    st.dataframe(comparison_table)
@@ -1,9 +1,10 @@
 # pages/4 - 🍲 Recipes.py
 
 import streamlit as st
-import requests
 
-from functions import initialize_session_state, show_cart_sidebar, get_recipes_by_ingredient, get_recipe_details
+from functions import initialize_session_state, show_cart_sidebar, get_recipes_by_ingredient, iter_recipe_details, parse_ingredients, cart_ingredients
+import meal_store
+from image_cache import thumbnail
 
 
 # User interface setup with Streamlit
@@ -78,57 +79,74 @@ st.markdown(
 st.markdown("<h1 class='title'>🍲 Recipe Generator with MealDB 🍲</h1>", unsafe_allow_html=True)
 
 # Subtitle description
-st.markdown("<p class='subtitle'>Enter an ingredient, and get simple recipes using that ingredient</p>", unsafe_allow_html=True)
+st.markdown("<p class='subtitle'>Enter one or more ingredients, and get simple recipes using all of them</p>", unsafe_allow_html=True)
 
-# Input field for the ingredient with styled label
-st.markdown("<label class='input-label'>Enter an ingredient</label>", unsafe_allow_html=True)
-ingredient = st.text_input("")
+# Input field for the ingredients with styled label
+st.markdown("<label class='input-label'>Enter ingredients (separated by commas)</label>", unsafe_allow_html=True)
+ingredients = parse_ingredients(st.text_input(""))
+
+# With the local MealDB mirror, the products of the cart can be used as ingredients
+if meal_store.is_available() and st.session_state.selected_products:
+    if st.checkbox("Use the products in my cart"):
+        from_cart = cart_ingredients(st.session_state.selected_products)
+        if from_cart:
+            st.caption(f"Ingredients found in your cart: {', '.join(from_cart)}")
+            ingredients += [name for name in from_cart if name not in ingredients]
+        else:
+            st.caption("No MealDB ingredient matches the products of your cart.")
+ingredient = ", ".join(ingredients)
+
+# Function to display the card of a recipe with its details
+def display_recipe_card(recipe, recipe_details):
+    # Display the recipe card with two columns
+    with st.container():
+        st.markdown(f"<div class='recipe-card'>", unsafe_allow_html=True)
+        st.subheader(f"{recipe['strMeal']}")
+        
+        # Two columns: one for the image, another for the ingredients
+        col1, col2 = st.columns([1, 2])
+        
+        # Column for the image
+        with col1:
+            st.image(thumbnail(recipe["strMealThumb"], 300), width=300)
+        
+        # Column for the ingredients
+        with col2:
+            st.markdown(f"### 🍽️ Ingredients required:")
+            ingredients = []
+            for i in range(1, 21):
+                ingredient_name = recipe_details.get(f"strIngredient{i}")
+                ingredient_measure = recipe_details.get(f"strMeasure{i}")
+                if ingredient_name and ingredient_name.strip():
+                    ingredients.append(f"{ingredient_measure} {ingredient_name}")
+
+            # Split the ingredients into two columns
+            half = len(ingredients) // 2
+            col_ingr1, col_ingr2 = st.columns(2)
+            with col_ingr1:
+                for ingr in ingredients[:half]:
+                    st.markdown(f"- <span class='ingredient'>{ingr}</span>", unsafe_allow_html=True)
+            with col_ingr2:
+                for ingr in ingredients[half:]:
+                    st.markdown(f"- <span class='ingredient'>{ingr}</span>", unsafe_allow_html=True)
+
+            # Button linking to the full recipe
+            st.markdown(f"<a href='https://www.themealdb.com/meal/{recipe['idMeal']}' target='_blank' class='recipe-button'>View Full Recipe</a>", unsafe_allow_html=True)
+        st.markdown("</div>", unsafe_allow_html=True)
 
 # If an ingredient is entered, search and display the recipes
 if ingredient:
     recipes = get_recipes_by_ingredient(ingredient)
     
     if isinstance(recipes, list):
-        for recipe in recipes:
-            # Fetch the complete details of the recipe
-            recipe_details = get_recipe_details(recipe["idMeal"])
+        # One placeholder per recipe, in the order of the results
+        placeholders = [st.empty() for recipe in recipes]
 
+        # The details are fetched concurrently: fill each card as soon as its details arrive
+        for index, recipe_details in iter_recipe_details(recipes, thumbnail_width=300):
             if recipe_details:
-                # Display the recipe card with two columns
-                with st.container():
-                    st.markdown(f"<div class='recipe-card'>", unsafe_allow_html=True)
-                    st.subheader(f"{recipe['strMeal']}")
-                    
-                    # Two columns: one for the image, another for the ingredients
-                    col1, col2 = st.columns([1, 2])
-                    
-                    # Column for the image
-                    with col1:
-                        st.image(recipe["strMealThumb"], width=300)
-                    
-                    # Column for the ingredients
-                    with col2:
-                        st.markdown(f"### 🍽️ Ingredients required:")
-                        ingredients = []
-                        for i in range(1, 21):
-                            ingredient_name = recipe_details.get(f"strIngredient{i}")
-                            ingredient_measure = recipe_details.get(f"strMeasure{i}")
-                            if ingredient_name and ingredient_name.strip():
-                                ingredients.append(f"{ingredient_measure} {ingredient_name}")
-
-                        # Split the ingredients into two columns
-                        half = len(ingredients) // 2
-                        col_ingr1, col_ingr2 = st.columns(2)
-                        with col_ingr1:
-                            for ingr in ingredients[:half]:
-                                st.markdown(f"- <span class='ingredient'>{ingr}</span>", unsafe_allow_html=True)
-                        with col_ingr2:
-                            for ingr in ingredients[half:]:
-                                st.markdown(f"- <span class='ingredient'>{ingr}</span>", unsafe_allow_html=True)
-
-                        # Button linking to the full recipe
-                        st.markdown(f"<a href='https://www.themealdb.com/meal/{recipe['idMeal']}' target='_blank' class='recipe-button'>View Full Recipe</a>", unsafe_allow_html=True)
-                    st.markdown("</div>", unsafe_allow_html=True)
+                with placeholders[index].container():
+                    display_recipe_card(recipes[index], recipe_details)
     else:
         st.write(recipes)  # If no recipes are found, display the response
 else:
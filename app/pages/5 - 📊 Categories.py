@@ -6,9 +6,11 @@ import pandas as pd
 from functions import (
    initialize_session_state, 
    show_cart_sidebar,
-   search_product_by_category,
-   process_products
+   get_category_frame,
+   CATEGORIES
 )
+import product_store
+import category_stats
 
 # Initialize session state and sidebar
 initialize_session_state()
@@ -47,8 +49,14 @@ st.markdown(
 st.markdown("<h1 class='title'>📊 Category Visualization</h1>", unsafe_allow_html=True)
 st.markdown("<p class='subtitle'>Explore trends and visualize product data by category</p>", unsafe_allow_html=True)
 
+# Columns of the charts and their nutrient in the category statistics
+STATS_NUTRIENTS = {
+    'Energy kcal': 'energy-kcal', 'Fat': 'fat', 'Saturated fat': 'saturated-fat', 'Carbohydrates': 'carbohydrates',
+    'Sugars': 'sugars', 'Fiber': 'fiber', 'Proteins': 'proteins', 'Salt': 'salt'
+}
+
 # List of available categories
-categories = ["Snacks", "Cereals and Potatoes", "Fruits", "Vegetables", "Dairy", "Beverages", "Waters"]
+categories = CATEGORIES
 
 # Dropdown for category selection
 st.markdown("<label class='input-label'>Select a category</label>", unsafe_allow_html=True)
@@ -61,12 +69,10 @@ nb_items = st.number_input("", min_value=10, max_value=100, value=20, step=5)
 if selected_category:
    st.markdown(f"<p class='subtitle'>Loading products for category: {selected_category}...</p>", unsafe_allow_html=True)
    
-   # Search for products by selected category and number of items
-   products = search_product_by_category(selected_category, nb_items)
+   # Get the processed products of the category (from the on-disk cache when available)
+   df_processed = get_category_frame(selected_category, nb_items)
    
-   if products:
-       # Process the products and convert them into a dataframe
-       df_processed = process_products(products)
+   if not df_processed.empty:
        # Ensure the 'nova_group' column is treated as a string for proper display
        if 'nova_group' in df_processed.columns:
            df_processed['nova_group'] = df_processed['nova_group'].astype(str)
@@ -132,5 +138,30 @@ if selected_category:
            fig.update_layout(xaxis_tickangle=-45, showlegend=False)
            # Display the plot
            st.plotly_chart(fig)
+
+           # Statistics over every product of the category (needs the local product store)
+           if product_store.is_available():
+               stats = category_stats.get_stats(selected_category)
+               if stats is None or not stats.count:
+                   st.info("Statistics over the whole category are being computed, come back in a moment.")
+               elif selected_column in ['nutriscore_grade', 'ecoscore_grade', 'nova_group']:
+                   st.markdown(f"<p class='subtitle'>All {stats.count} products of the category</p>", unsafe_allow_html=True)
+                   counts = pd.Series(stats.grades[selected_column]).sort_index()
+                   fig = px.bar(counts, title=f"Distribution of {selected_column} (whole category)",
+                                labels={'value': 'Product Quantity', 'index': selected_column})
+                   fig.update_layout(showlegend=False)
+                   st.plotly_chart(fig)
+               else:
+                   nutrient = STATS_NUTRIENTS[selected_column]
+                   st.markdown(f"<p class='subtitle'>All {stats.count} products of the category</p>", unsafe_allow_html=True)
+                   st.dataframe(pd.DataFrame([stats.summary(nutrient)]).round(2))
+                   histogram = pd.DataFrame(stats.histogram(nutrient), columns=['from', 'to', 'count'])
+                   histogram['range'] = histogram['from'].round(1).astype(str) + ' - ' + histogram['to'].round(1).astype(str)
+                   fig = px.bar(histogram, x='range', y='count',
+                                title=f"Distribution of {selected_column} per 100 g (whole category)",
+                                labels={'range': 'Amount in kcal' if selected_column == 'Energy kcal' else 'Amount in g',
+                                        'count': 'Product Quantity'})
+                   fig.update_layout(xaxis_tickangle=-45)
+                   st.plotly_chart(fig)
    #else:
        #st.warning(f"No products found for category: {selected_category}.")
@@ -0,0 +1,74 @@
+# pages/6 - 🛠️ Cache Admin.py
+
+import streamlit as st
+import pandas as pd
+
+from functions import initialize_session_state, show_cart_sidebar
+from cache_policy import cache_stats, list_entries, purge
+from product_cache import PRODUCT_CACHE
+import response_cache
+from figure_cache import FIGURE_CACHE
+import prewarm
+
+# Initialize session state and sidebar
+initialize_session_state()
+show_cart_sidebar()
+
+# Title of the page
+st.title("🛠️ Cache Administration")
+
+# Metrics of every cached function (policy, size and hit/miss/eviction counters)
+st.subheader("Cached functions")
+stats = pd.DataFrame(cache_stats())
+if not stats.empty:
+    stats["size (MB)"] = (stats["bytes"] / 1024 / 1024).round(2)
+    stats["max size (MB)"] = (stats["max_bytes"] / 1024 / 1024).round(2)
+    stats["hit rate"] = (stats["hits"] / (stats["hits"] + stats["misses"]).clip(lower=1)).round(2)
+    st.dataframe(stats.drop(columns=["bytes", "max_bytes"]), use_container_width=True)
+
+    # Entries of one cached function
+    function_name = st.selectbox("Cached function", stats["function"])
+    entries = pd.DataFrame(list_entries(function_name))
+    if entries.empty:
+        st.write("No entries.")
+    else:
+        entries["age (s)"] = entries.pop("age").round()
+        entries["expires in (s)"] = entries.pop("expires_in").round()
+        st.dataframe(entries, use_container_width=True)
+
+        # Purge a single entry
+        key = st.selectbox("Entry", entries["key"], format_func=lambda k: entries.set_index("key").loc[k, "arguments"])
+        if st.button("Purge entry", key="purge_entry"):
+            purge(function_name, key)
+            st.rerun()
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button(f"Purge {function_name}", key="purge_function", use_container_width=True):
+            purge(function_name)
+            st.rerun()
+    with col2:
+        if st.button("Purge all caches", key="purge_all", use_container_width=True):
+            purge()
+            st.rerun()
+else:
+    st.write("No cached function has been used yet.")
+
+# Shared product records (see product_cache.py)
+st.subheader("Shared product records")
+st.json(PRODUCT_CACHE.stats())
+
+# Background prewarm of the categories (see prewarm.py)
+st.subheader("Category prewarm")
+st.json(prewarm.status())
+
+# Dashboard figures (see figure_cache.py)
+st.subheader("Dashboard figures")
+st.json(FIGURE_CACHE.stats())
+
+# Persistent HTTP response cache (see response_cache.py)
+st.subheader("HTTP response cache")
+st.json(response_cache.stats())
+if st.button("Clear HTTP response cache", key="clear_http_cache"):
+    response_cache.clear()
+    st.rerun()
@@ -0,0 +1,85 @@
+# prewarm.py
+#
+# Background worker filling the caches of the categories offered by the Products and
+# Categories pages, so the first user to pick a category doesn't wait for a cold crawl.
+# It is started once per server process (see start), runs in a daemon thread that never
+# calls Streamlit, and refreshes the caches every PREWARM_INTERVAL, shortly before the
+# cached searches expire. Its requests are background requests: they leave part of the
+# shared rate budget to the users (see rate_limiter.background_priority).
+#
+# Set PREWARM=0 to disable it (e.g. in development).
+
+import os
+import threading
+import time
+
+from rate_limiter import background_priority
+
+# Whether the worker runs at all
+ENABLED = os.environ.get("PREWARM", "1") != "0"
+
+# Number of products prewarmed for each category: the default of the Products page
+# and the values most often picked on the Categories page
+PREWARM_SIZES = (20, 50)
+
+# Wait before the first run (let the first page render first), and between two runs
+# (a bit less than the time to live of search_product_by_category, see cache_policy.py)
+STARTUP_DELAY = 10
+PREWARM_INTERVAL = 5 * 3600
+
+_thread = None
+_lock = threading.Lock()
+_status = {"runs": 0, "last_run": None, "last_duration": None, "next_run": None, "errors": []}
+
+# Function to prewarm one category: its searches, then its cached processed frame
+def prewarm_category(category):
+    # Imported here: functions imports this module
+    from functions import search_product_by_category, process_products
+    from category_cache import save_category_frame
+
+    products = []
+    for nb_items in sorted(PREWARM_SIZES):
+        products = search_product_by_category.refresh(category, nb_items)
+
+    # The frame of the largest size also serves the smaller ones
+    df_processed = process_products(products)
+    if not df_processed.empty:
+        save_category_frame(category, df_processed)
+
+# Function to prewarm every category once
+def prewarm_all():
+    from functions import CATEGORIES
+
+    started = time.time()
+    errors = []
+    for category in CATEGORIES:
+        try:
+            prewarm_category(category)
+        except Exception as e:
+            errors.append(f"{category}: {e}")
+            print(f"Prewarm of category {category} failed: {e}")
+
+    _status.update(runs=_status["runs"] + 1, last_run=started, last_duration=time.time() - started, errors=errors)
+
+def run():
+    time.sleep(STARTUP_DELAY)
+    while True:
+        with background_priority():
+            prewarm_all()
+        _status["next_run"] = time.time() + PREWARM_INTERVAL
+        time.sleep(PREWARM_INTERVAL)
+
+# Function to start the worker (only the first call of the process starts it)
+def start():
+    global _thread
+    if not ENABLED or _thread is not None:
+        return
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=run, name="prewarm", daemon=True)
+            _thread.start()
+            _status["next_run"] = time.time() + STARTUP_DELAY
+
+# Function to get the state of the worker (for the Cache Admin page)
+def status():
+    return {"enabled": ENABLED, "running": _thread is not None and _thread.is_alive(), **_status}
@@ -0,0 +1,97 @@
+# product_cache.py
+#
+# Process-wide cache of product records, keyed by barcode and bounded in bytes (LRU).
+# Every fetch path of the app puts the products it receives here, and sessions keep
+# references to these shared records: a product added to 200 carts is stored once.
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from product_record import ProductRecord
+
+# Maximum memory used by the cached records (can be overridden with PRODUCT_CACHE_MB)
+MAX_BYTES = int(os.environ.get("PRODUCT_CACHE_MB", "64")) * 1024 * 1024
+
+# Function to estimate the memory used by a record
+def record_size(record):
+    size = sys.getsizeof(record)
+    for field in record.__slots__:
+        value = getattr(record, field)
+        size += sys.getsizeof(value)
+        if isinstance(value, tuple):
+            size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+class ProductCache:
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # barcode -> (record, size), least recently used first
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, code):
+        # Get the cached record of a barcode (None if not cached)
+        with self.lock:
+            entry = self.entries.get(code)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(code)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, product):
+        # Cache a freshly fetched product (replacing any older version) and return its record
+        record = product if isinstance(product, ProductRecord) else ProductRecord(product)
+        if not record.code:
+            return record
+        size = record_size(record)
+        with self.lock:
+            old = self.entries.pop(record.code, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self.entries[record.code] = (record, size)
+            self.bytes += size
+            # Drop the least recently used records until we are under the limit
+            while self.bytes > self.max_bytes and len(self.entries) > 1:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+        return record
+
+    def intern(self, product):
+        # Return the shared record of a product, creating it only if it isn't cached yet
+        code = product.get('code')
+        record = self.get(code) if code else None
+        return record if record is not None else self.put(product)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+# Cache shared by every session of the process
+PRODUCT_CACHE = ProductCache()
+
+# Function to cache the products returned by a fetch
+def cache_products(products):
+    for product in products:
+        PRODUCT_CACHE.put(product)
+    return products
+
+# Function to convert a list of API products (or records) to the shared cached records
+def to_records(products):
+    return [PRODUCT_CACHE.intern(product) for product in products]
@@ -0,0 +1,62 @@
+# product_record.py
+#
+# Compact representation of a product kept in st.session_state (cart and search results).
+# A full OpenFoodFacts document weighs 50-200 KB; a record only keeps the fields the pages
+# display, with the nutrients packed in a float array.
+# Records are shared between sessions through product_cache.PRODUCT_CACHE.
+
+from array import array
+
+# Nutrients used by the pages, in the order they are stored in a record
+NUTRIENT_KEYS = ('energy-kcal', 'fat', 'saturated-fat', 'carbohydrates', 'sugars', 'fiber', 'proteins', 'salt')
+
+# Text fields used by the pages
+TEXT_FIELDS = (
+    'code', 'product_name', 'url', 'quantity', 'brands', 'price',
+    'categories', 'origins', 'labels', 'allergens', 'nutrition_data_per',
+    'nutriscore_grade', 'ecoscore_grade', 'image_url', 'image_front_small_url'
+)
+
+NAN = float('nan')
+
+# Function to convert a nutrient value to a float (NaN if missing or invalid)
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+class ProductRecord:
+    __slots__ = TEXT_FIELDS + ('nova_group', 'countries_tags', 'nutrient_values')
+
+    def __init__(self, product):
+        for field in TEXT_FIELDS:
+            setattr(self, field, product.get(field) or None)
+        self.nova_group = product.get('nova_group')
+        self.countries_tags = tuple(product.get('countries_tags') or ())
+
+        nutriments = product.get('nutriments') or {}
+        self.nutrient_values = array('d', [to_float(nutriments.get(key)) for key in NUTRIENT_KEYS])
+
+    @property
+    def nutriments(self):
+        # Nutrients as a dict, like in the API (missing nutrients are left out)
+        return {key: value for key, value in zip(NUTRIENT_KEYS, self.nutrient_values) if value == value}
+
+    def get(self, key, default=None):
+        # Same interface as the product dicts returned by the API
+        if key == 'nutriments':
+            return self.nutriments
+        if key not in self.__slots__:
+            return default
+        value = getattr(self, key)
+        return default if value is None else value
+
+    def to_dict(self):
+        product = {field: getattr(self, field) for field in TEXT_FIELDS if getattr(self, field) is not None}
+        product.update(nova_group=self.nova_group, countries_tags=list(self.countries_tags), nutriments=self.nutriments)
+        return product
+
+    def __repr__(self):
+        return f"ProductRecord(code={self.code!r}, product_name={self.product_name!r})"
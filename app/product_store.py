@@ -0,0 +1,446 @@
+# product_store.py
+#
+# Local OpenFoodFacts product store (SQLite), built from the official bulk export:
+#
+#     python app/product_store.py ingest openfoodfacts-products.jsonl.gz
+#     python app/product_store.py ingest en.openfoodfacts.org.products.csv.gz
+#
+# Once the store exists, the search functions of the app read from it instead of the network.
+# Categories are then kept up to date incrementally, only pulling products modified since
+# the last sync (see sync_category):
+#
+#     python app/product_store.py sync Snacks Fruits
+
+import argparse
+import contextvars
+import csv
+import gzip
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from storage import DATA_DIR, connect
+
+# Location of the store (can be overridden with the OFF_STORE_PATH environment variable)
+STORE_PATH = os.environ.get("OFF_STORE_PATH", os.path.join(DATA_DIR, "openfoodfacts.db"))
+
+# Product fields actually read by the app. They are sent as `fields=` on every
+# OpenFoodFacts request and are the only fields kept in the store:
+# - process_products: every field below except image_url, price and brands
+# - create_nutrient_comparison / create_radar_comparison: product_name, nutriments, grades, nova_group
+# - display_sales_map / display_sales_info_and_map: product_name, countries_tags
+# - Products and Compare pages: image_url, price, brands, origins, categories, labels
+PRODUCT_FIELDS = [
+    "code", "product_name", "url", "quantity", "brands", "price",
+    "categories", "origins", "labels", "allergens", "countries_tags",
+    "nutriments", "nutrition_data_per",
+    "nutriscore_grade", "ecoscore_grade", "nova_group",
+    "image_url", "image_front_small_url"
+]
+
+# Number of products written to the database at once during ingestion
+BATCH_SIZE = 2000
+
+# Weights of the product name, brand and category columns when ranking search results (BM25)
+SEARCH_WEIGHTS = (10.0, 3.0, 1.0)
+
+# Incremental sync: how often a category is synced, and how many pages a sync may read
+SYNC_INTERVAL = 6 * 3600
+SYNC_MAX_PAGES = 20
+SYNC_PAGE_SIZE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    code TEXT PRIMARY KEY,
+    product_name TEXT,
+    last_modified_t INTEGER,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS product_categories (
+    category TEXT NOT NULL,
+    code TEXT NOT NULL,
+    PRIMARY KEY (category, code)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS product_categories_code ON product_categories (code);
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5 (
+    product_name, brands, categories,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    category TEXT PRIMARY KEY,
+    last_modified_t INTEGER NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_resume (
+    category TEXT PRIMARY KEY,
+    page INTEGER NOT NULL,
+    high_water INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ingest_state (
+    dump TEXT NOT NULL,
+    products INTEGER NOT NULL,
+    finished_at REAL NOT NULL
+);
+"""
+
+# Function to get the connection of the current thread to the store
+def get_connection(path=None):
+    return connect(path or STORE_PATH, SCHEMA)
+
+_ingested = set()  # Stores known to hold a completed ingestion
+
+# Function to check if a local store has been built: a dump must have been fully ingested
+# (a store only filled by `sync` or created by a reader holds a few categories at most)
+def is_available(path=None):
+    path = path or STORE_PATH
+    if path in _ingested:
+        return True
+    if not os.path.exists(path):
+        return False
+    if get_connection(path).execute("SELECT 1 FROM ingest_state LIMIT 1").fetchone() is None:
+        return False
+    _ingested.add(path)
+    return True
+
+# Function to convert a category name ("Cereals and Potatoes") to its OpenFoodFacts tag ("en:cereals-and-potatoes")
+def category_tag(category):
+    tag = "-".join(category.strip().lower().replace("_", " ").split())
+    return tag if ":" in tag else f"en:{tag}"
+
+# Function to keep only the fields used by the app
+def project_product(product):
+    return {key: product[key] for key in PRODUCT_FIELDS if product.get(key) not in (None, "")}
+
+# Function to convert a row of the CSV export to the same shape as the JSON API
+def product_from_csv_row(row):
+    product = {key: value for key, value in row.items() if value}
+
+    # Lists are stored as comma-separated tags
+    for key in ("countries_tags", "categories_tags"):
+        product[key] = [tag for tag in product.get(key, "").split(",") if tag]
+
+    # Grades and numbers
+    if "ecoscore_grade" not in product and row.get("environmental_score_grade"):
+        product["ecoscore_grade"] = row["environmental_score_grade"]
+    if "image_front_small_url" not in product and row.get("image_small_url"):
+        product["image_front_small_url"] = row["image_small_url"]
+    for key in ("nova_group", "last_modified_t"):
+        try:
+            product[key] = int(float(product[key]))
+        except (KeyError, ValueError):
+            product.pop(key, None)
+
+    # Nutriments are stored in "<nutrient>_100g" columns
+    nutriments = {}
+    for key, value in row.items():
+        if key.endswith("_100g") and value:
+            try:
+                nutriments[key] = nutriments[key[:-len("_100g")]] = float(value)
+            except ValueError:
+                pass
+    product["nutriments"] = nutriments
+    return product
+
+# Function to read the products of a dump one by one (never loading the whole file)
+def iter_dump(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    name = path[:-3] if path.endswith(".gz") else path
+
+    with opener(path, "rt", encoding="utf-8", newline="" if name.endswith((".csv", ".tsv")) else None) as file:
+        if name.endswith((".csv", ".tsv")):
+            # The CSV export is tab-separated and has very long fields
+            csv.field_size_limit(sys.maxsize)
+            for row in csv.DictReader(file, delimiter="\t", quoting=csv.QUOTE_NONE):
+                yield product_from_csv_row(row)
+        else:
+            for line in file:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue  # Skip corrupted lines
+
+# Function to insert or update a batch of products (matched by barcode)
+def upsert_products(products, path=None):
+    connection = get_connection(path)
+
+    # A barcode may appear twice in a batch (e.g. in a dump): keep its last version only,
+    # the search index can't hold two rows for the same product
+    latest = {}
+    for product in products:
+        code = product.get("code")
+        if code:
+            latest.pop(code, None)
+            latest[code] = product
+
+    rows = []
+    search_rows = []
+    categories = []
+    for code, product in latest.items():
+        data = project_product(product)
+        rows.append((code, data.get("product_name"), product.get("last_modified_t"), json.dumps(data, ensure_ascii=False)))
+        search_rows.append((data.get("product_name"), data.get("brands"), data.get("categories"), code))
+        if "categories_tags" in product:
+            categories.append((code, product["categories_tags"] or []))
+
+    with connection:
+        # ON CONFLICT keeps the rowid of existing products, so rowids only grow for new products
+        connection.executemany(
+            """INSERT INTO products (code, product_name, last_modified_t, data) VALUES (?, ?, ?, ?)
+               ON CONFLICT(code) DO UPDATE SET product_name = excluded.product_name,
+                   last_modified_t = excluded.last_modified_t, data = excluded.data""",
+            rows
+        )
+        # Full-text search index, sharing the rowids of the products table
+        connection.executemany(
+            "DELETE FROM products_fts WHERE rowid = (SELECT rowid FROM products WHERE code = ?)",
+            [(row[0],) for row in rows]
+        )
+        connection.executemany(
+            """INSERT INTO products_fts (rowid, product_name, brands, categories)
+               SELECT rowid, ?, ?, ? FROM products WHERE code = ?""",
+            search_rows
+        )
+        # Categories are replaced only for products that came with their categories_tags
+        connection.executemany("DELETE FROM product_categories WHERE code = ?", [(code,) for code, _ in categories])
+        connection.executemany(
+            "INSERT OR IGNORE INTO product_categories (category, code) VALUES (?, ?)",
+            [(tag, code) for code, tags in categories for tag in tags]
+        )
+    return len(rows)
+
+# Function to stream a dump into the store
+def ingest(dump_path, path=None, progress=print):
+    total = 0
+    batch = []
+    for product in iter_dump(dump_path):
+        batch.append(product)
+        if len(batch) >= BATCH_SIZE:
+            total += upsert_products(batch, path)
+            batch = []
+            if progress and total % (BATCH_SIZE * 50) == 0:
+                progress(f"{total} products ingested...")
+    total += upsert_products(batch, path)
+
+    # Mark the store as built (see is_available)
+    connection = get_connection(path)
+    with connection:
+        connection.execute(
+            "INSERT INTO ingest_state (dump, products, finished_at) VALUES (?, ?, ?)",
+            (os.path.basename(dump_path), total, time.time())
+        )
+    if progress:
+        progress(f"Done: {total} products ingested into {path or STORE_PATH}")
+    return total
+
+# Function to get a product by its barcode (None if unknown)
+def get_product(code, path=None):
+    row = get_connection(path).execute("SELECT data FROM products WHERE code = ?", (code,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+# Function to iterate over the products of a category, in insertion order
+def iter_category_products(category, path=None):
+    cursor = get_connection(path).execute(
+        """SELECT p.data FROM product_categories c JOIN products p ON p.code = c.code
+           WHERE c.category = ? ORDER BY p.rowid""",
+        (category_tag(category),)
+    )
+    for (data,) in cursor:
+        yield json.loads(data)
+
+# Function to iterate over the products of a category added after a given rowid, as (rowid, product).
+# Rowids only grow for new products (updates keep theirs), so a reader can resume from the last one it saw.
+def iter_category_rows(category, after_rowid=0, path=None):
+    cursor = get_connection(path).execute(
+        """SELECT p.rowid, p.data FROM product_categories c JOIN products p ON p.code = c.code
+           WHERE c.category = ? AND p.rowid > ? ORDER BY p.rowid""",
+        (category_tag(category), after_rowid)
+    )
+    for rowid, data in cursor:
+        yield rowid, json.loads(data)
+
+# Function to get the first `limit` products of a category
+def get_products_by_category(category, limit=24, path=None):
+    products = []
+    for product in iter_category_products(category, path):
+        if len(products) >= limit:
+            break
+        products.append(product)
+    return products
+
+# Function to turn a user query into a full-text query: every word must match,
+# and the last one may be incomplete ("nutel" finds "Nutella")
+def fts_query(query):
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words[:-1]) + f' "{words[-1]}"*'
+
+# Function to search products by name, brand or category, best matches first.
+# Accents and case are ignored ("pate" finds "Pâte").
+def search_products(query, limit=24, category=None, path=None):
+    match = fts_query(query)
+    if match is None:
+        return []
+
+    sql = """SELECT p.data FROM products_fts f JOIN products p ON p.rowid = f.rowid
+             WHERE products_fts MATCH ?"""
+    params = [match]
+    if category:
+        sql += " AND p.code IN (SELECT code FROM product_categories WHERE category = ?)"
+        params.append(category_tag(category))
+    sql += f" ORDER BY bm25(products_fts, {', '.join(map(str, SEARCH_WEIGHTS))}) LIMIT ?"
+    params.append(limit)
+
+    return [json.loads(data) for (data,) in get_connection(path).execute(sql, params)]
+
+# Function to rebuild the search index from the stored products (e.g. for a store built before it existed)
+def rebuild_search_index(path=None):
+    connection = get_connection(path)
+    with connection:
+        connection.execute("DELETE FROM products_fts")
+        connection.execute(
+            """INSERT INTO products_fts (rowid, product_name, brands, categories)
+               SELECT rowid, product_name, json_extract(data, '$.brands'), json_extract(data, '$.categories')
+               FROM products"""
+        )
+
+# Function to get the sync state of a category: its high-water mark (every product modified up to
+# this last_modified_t is in the store), and where an unfinished sync stopped (resume_page, None if
+# the last sync finished, and the most recent last_modified_t that sync had seen)
+def get_sync_state(category, path=None):
+    connection = get_connection(path)
+    tag = category_tag(category)
+    resume = connection.execute("SELECT page, high_water FROM sync_resume WHERE category = ?", (tag,)).fetchone()
+    state = {"resume_page": resume[0], "resume_high_water": resume[1]} if resume else {"resume_page": None, "resume_high_water": None}
+    row = connection.execute("SELECT last_modified_t, synced_at FROM sync_state WHERE category = ?", (tag,)).fetchone()
+    if row:
+        return {"last_modified_t": row[0], "synced_at": row[1], **state}
+
+    # Never synced: start from the most recent product of the category already in the store (e.g. from the dump)
+    row = connection.execute(
+        """SELECT MAX(p.last_modified_t) FROM product_categories c JOIN products p ON p.code = c.code
+           WHERE c.category = ?""",
+        (tag,)
+    ).fetchone()
+    return {"last_modified_t": row[0] or 0, "synced_at": None, **state}
+
+# Function to pull the products of a category modified since the last sync and merge them by barcode.
+# The high-water mark only moves once the sync has read every product modified since the last one.
+# A sync stopped before (max_pages reached, request error) saves where it stopped, and the next
+# sync carries on from there.
+def sync_category(category, max_pages=SYNC_MAX_PAGES, path=None):
+    from http_client import http_get  # Only loaded to sync (requests is slow to import)
+
+    tag = category_tag(category)
+    state = get_sync_state(category, path)
+    high_water = state["last_modified_t"]
+    first_page = state["resume_page"] or 1
+    new_high_water = max(high_water, state["resume_high_water"] or 0)
+    url = f"https://world.openfoodfacts.org/category/{category}.json"
+    fields = ",".join(PRODUCT_FIELDS + ["categories_tags", "last_modified_t"])
+    updated = 0
+    finished = False
+    page = first_page
+
+    try:
+        while page < first_page + max_pages:
+            # Most recently modified products first (never from the response cache: we want the latest changes)
+            response = http_get(url, params={
+                "page": page,
+                "page_size": SYNC_PAGE_SIZE,
+                "sort_by": "last_modified_t",
+                "fields": fields
+            }, cache=False)
+            response.raise_for_status()
+            products = response.json().get("products", [])
+
+            # Keep only the products modified after the high-water mark
+            modified = [p for p in products if (p.get("last_modified_t") or 0) > high_water]
+            for product in modified:
+                product.setdefault("categories_tags", [tag])
+                new_high_water = max(new_high_water, product["last_modified_t"])
+            updated += upsert_products(modified, path)
+
+            # Stop as soon as we reach products we already have
+            if len(modified) < len(products) or not products:
+                finished = True
+                break
+            page += 1
+    finally:
+        with get_connection(path) as connection:
+            if finished:
+                connection.execute("DELETE FROM sync_resume WHERE category = ?", (tag,))
+            else:
+                # Keep the old mark (the products between it and this page are still missing), and
+                # read the last page again next time if this sync moved on (products modified since
+                # move the others up)
+                resume_page = page - 1 if page - 1 > first_page else page
+                connection.execute(
+                    "INSERT OR REPLACE INTO sync_resume (category, page, high_water) VALUES (?, ?, ?)",
+                    (tag, resume_page, new_high_water)
+                )
+            connection.execute(
+                "INSERT OR REPLACE INTO sync_state (category, last_modified_t, synced_at) VALUES (?, ?, ?)",
+                (tag, new_high_water if finished else high_water, time.time())
+            )
+    return updated
+
+_syncing = set()
+_syncing_lock = threading.Lock()
+
+# Function to sync a category in a background thread if its last sync is older than `max_age`.
+# The local data is served as-is in the meantime, so page reruns never wait for the network.
+def ensure_fresh(category, max_age=SYNC_INTERVAL, path=None):
+    synced_at = get_sync_state(category, path)["synced_at"]
+    if synced_at is not None and time.time() - synced_at < max_age:
+        return
+
+    tag = category_tag(category)
+    with _syncing_lock:
+        if tag in _syncing:
+            return
+        _syncing.add(tag)
+
+    def run():
+        try:
+            sync_category(category, path=path)
+        except Exception as e:
+            print(f"Sync of category {category} failed: {e}")
+        finally:
+            with _syncing_lock:
+                _syncing.discard(tag)
+
+    # Run in the caller's context, so a sync started by the prewarm worker keeps its
+    # background priority (see rate_limiter.background_priority)
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(run,), name=f"sync-{tag}", daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenFoodFacts product store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Load an OpenFoodFacts JSONL or CSV export (optionally .gz)")
+    ingest_parser.add_argument("dump", help="Path to the export file")
+    ingest_parser.add_argument("--store", default=None, help=f"Store path (default: {STORE_PATH})")
+
+    sync_parser = subparsers.add_parser("sync", help="Pull the products modified since the last sync")
+    sync_parser.add_argument("categories", nargs="+", help="Category names (e.g. Snacks)")
+    sync_parser.add_argument("--max-pages", type=int, default=SYNC_MAX_PAGES, help="Maximum number of pages per category")
+    sync_parser.add_argument("--store", default=None, help=f"Store path (default: {STORE_PATH})")
+
+    reindex_parser = subparsers.add_parser("reindex", help="Rebuild the product search index")
+    reindex_parser.add_argument("--store", default=None, help=f"Store path (default: {STORE_PATH})")
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        ingest(args.dump, args.store)
+    elif args.command == "sync":
+        for category in args.categories:
+            print(f"{category}: {sync_category(category, args.max_pages, args.store)} products updated")
+    elif args.command == "reindex":
+        rebuild_search_index(args.store)
@@ -0,0 +1,147 @@
+# rate_limiter.py
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+# Request budgets published by OpenFoodFacts (requests per minute).
+# Each rule is (name, host, path prefixes, requests per minute); the first matching rule wins.
+RATE_LIMITS = [
+    ("off_search", "world.openfoodfacts.org", ("/cgi/search.pl", "/api/v2/search"), 10),
+    ("off_facets", "world.openfoodfacts.org", ("/category/", "/categories", "/facets/"), 2),
+    ("off_products", "world.openfoodfacts.org", ("/api/",), 100),
+]
+
+# HTTP status codes worth retrying, and how long we are ready to wait for them
+RETRY_STATUSES = (429, 502, 503, 504)
+MAX_RETRIES = 3
+BASE_BACKOFF = 1.0    # First backoff delay in seconds, doubled at each attempt
+MAX_BACKOFF = 30.0    # Never wait longer than this between two attempts
+
+# Share of each bucket kept for the users: background requests (e.g. the prewarm worker)
+# only get a token when more than this share of the bucket is still available
+BACKGROUND_RESERVE = 0.5
+
+# Longest a user request waits for a token before giving up (background requests wait as long
+# as needed): a burst from one session must not freeze the script threads of the others
+MAX_WAIT = 30.0
+
+# Whether the requests of the current context are background requests (see background_priority)
+_background = ContextVar("background_requests", default=False)
+
+# Request given up because no token could be had in time (or the server kept answering 429)
+class RateLimitExceeded(Exception):
+    pass
+
+# Function to check if the requests of the current context are background requests
+def is_background():
+    return _background.get()
+
+# Context manager marking the requests made inside it as background requests
+@contextmanager
+def background_priority():
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+class TokenBucket:
+    # Token bucket allowing `rate_per_minute` requests per minute on average,
+    # with bursts of up to `capacity` requests. Background requests leave `reserve`
+    # tokens in the bucket for the users.
+    def __init__(self, rate_per_minute, capacity=None, reserve=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.reserve = self.capacity * BACKGROUND_RESERVE if reserve is None else reserve
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        # Add the tokens earned since the last update, up to the capacity
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, max_wait=None, cancelled=None):
+        # Wait until a token is available, then consume it and return True.
+        # Background requests wait until a token is available above the reserve.
+        # Returns False without consuming a token if the wait would end after `max_wait` seconds
+        # (MAX_WAIT for user requests, no limit for background ones) or if the `cancelled`
+        # event is set while waiting (e.g. the caller doesn't need the response anymore).
+        background = _background.get()
+        needed = 1 + self.reserve if background else 1
+        if max_wait is None and not background:
+            max_wait = MAX_WAIT
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        while True:
+            if cancelled is not None and cancelled.is_set():
+                return False
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self.tokens >= needed:
+                        self.tokens -= 1
+                        return True
+                    wait = (needed - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            if cancelled is not None:
+                if cancelled.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+    def available(self):
+        # Number of requests the current context could send right now without waiting
+        reserve = self.reserve if _background.get() else 0
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            return 0 if self.blocked_until > now else max(0, int(self.tokens - reserve))
+
+    def pause(self, seconds):
+        # Stop handing out tokens for `seconds` (e.g. after a 429 with Retry-After)
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+# One bucket per rule, shared by every session of the process
+_buckets = {name: TokenBucket(rate) for name, _, _, rate in RATE_LIMITS}
+
+# Function to find the bucket limiting a URL (None if the host has no published budget)
+def bucket_for(url):
+    parts = urlsplit(url)
+    for name, host, prefixes, _ in RATE_LIMITS:
+        if parts.hostname == host and parts.path.startswith(prefixes):
+            return _buckets[name]
+    return None
+
+# Function to read the Retry-After header (in seconds or as an HTTP date)
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+# Function to compute how long to wait before retrying a failed request
+def retry_delay(response, attempt):
+    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+    if retry_after is not None:
+        return retry_after
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
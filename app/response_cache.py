@@ -0,0 +1,172 @@
+# response_cache.py
+#
+# Persistent cache of HTTP responses (SQLite, data/http_cache.db), used by http_client.http_get.
+# Bodies are stored compressed and keyed by the normalised URL and query parameters, so the
+# cache survives restarts and redeploys. Once an entry is older than its freshness lifetime,
+# it is revalidated with If-None-Match / If-Modified-Since (a 304 reply costs no body), and it
+# is still served if the network fails. The least recently used entries are evicted once the
+# cache grows over MAX_BYTES.
+
+import hashlib
+import json
+import os
+import time
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from storage import DATA_DIR, connect
+
+# Location and maximum size of the cache (can be overridden with HTTP_CACHE_PATH and HTTP_CACHE_MB)
+CACHE_PATH = os.environ.get("HTTP_CACHE_PATH", os.path.join(DATA_DIR, "http_cache.db"))
+MAX_BYTES = int(os.environ.get("HTTP_CACHE_MB", "256")) * 1024 * 1024
+
+# How long (in seconds) a response is served without asking the server again, by host
+FRESH_FOR = {
+    "world.openfoodfacts.org": 3600,
+    "www.themealdb.com": 24 * 3600
+}
+DEFAULT_FRESH_FOR = 3600
+
+# Headers that no longer describe the stored body (it is kept decoded)
+DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding", "connection")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+"""
+
+# Function to get the connection of the current thread to the cache
+def get_connection():
+    return connect(CACHE_PATH, SCHEMA, timeout=30)
+
+# Function to normalise a URL and its parameters: lower-case scheme and host, no fragment,
+# and every query parameter (from the URL or from params) sorted
+def normalise_url(url, params=None):
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    for name, value in (params or {}).items():
+        if value is None:
+            continue
+        values = value if isinstance(value, (list, tuple)) else [value]
+        query.extend((name, str(item)) for item in values)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", urlencode(sorted(query)), ""))
+
+# Function to get the cache key of a request
+def cache_key(url, params=None):
+    return hashlib.sha256(normalise_url(url, params).encode("utf-8")).hexdigest()
+
+# Function to get the freshness lifetime of a URL
+def fresh_for(url):
+    return FRESH_FOR.get(urlsplit(url).hostname, DEFAULT_FRESH_FOR)
+
+# Function to get a cached entry (None if the URL was never cached)
+def lookup(key):
+    row = get_connection().execute(
+        "SELECT url, headers, body, fetched_at FROM responses WHERE key = ?", (key,)
+    ).fetchone()
+    if row is None:
+        return None
+    url, headers, body, fetched_at = row
+    return {
+        "key": key,
+        "url": url,
+        "headers": json.loads(headers),
+        "body": body,
+        "fresh": time.time() - fetched_at < fresh_for(url)
+    }
+
+# Function to get the conditional headers used to revalidate a stale entry
+def conditional_headers(entry):
+    headers = {}
+    if "etag" in entry["headers"]:
+        headers["If-None-Match"] = entry["headers"]["etag"]
+    if "last-modified" in entry["headers"]:
+        headers["If-Modified-Since"] = entry["headers"]["last-modified"]
+    return headers
+
+# Function to rebuild a requests.Response from a cached entry
+def to_response(entry):
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response.url = entry["url"]
+    response.headers = CaseInsensitiveDict(entry["headers"])
+    response._content = zlib.decompress(entry["body"])
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.from_cache = True
+    return response
+
+# Function to store a successful response
+def store(key, url, response):
+    headers = {name.lower(): value for name, value in response.headers.items() if name.lower() not in DROPPED_HEADERS}
+    body = zlib.compress(response.content, 6)
+    now = time.time()
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO responses (key, url, headers, body, size, fetched_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, url, json.dumps(headers), body, len(body), now, now)
+        )
+    evict()
+
+# Function to mark an entry as fresh again after a 304 Not Modified (with the new validators, if any)
+def revalidated(entry, response):
+    headers = dict(entry["headers"])
+    for name in ("etag", "last-modified", "cache-control", "expires", "date"):
+        if name in response.headers:
+            headers[name] = response.headers[name]
+    entry["headers"] = headers
+    now = time.time()
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            "UPDATE responses SET headers = ?, fetched_at = ?, last_access = ? WHERE key = ?",
+            (json.dumps(headers), now, now, entry["key"])
+        )
+
+# Function to record that an entry has been served (for the LRU eviction)
+def touch(entry):
+    connection = get_connection()
+    with connection:
+        connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), entry["key"]))
+
+# Function to remove the least recently used entries until the cache is under MAX_BYTES
+def evict(max_bytes=None):
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    connection = get_connection()
+    total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= max_bytes:
+        return 0
+
+    # Walk the entries from the least recently used and delete them until we are under the limit
+    keys = []
+    for key, size in connection.execute("SELECT key, size FROM responses ORDER BY last_access"):
+        keys.append((key,))
+        total -= size
+        if total <= max_bytes:
+            break
+    with connection:
+        connection.executemany("DELETE FROM responses WHERE key = ?", keys)
+    return len(keys)
+
+# Function to get the size of the cache
+def stats():
+    entries, size = get_connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    return {"entries": entries, "bytes": size, "max_bytes": MAX_BYTES}
+
+# Function to empty the cache
+def clear():
+    connection = get_connection()
+    with connection:
+        connection.execute("DELETE FROM responses")
@@ -0,0 +1,64 @@
+# session.py
+#
+# Session state and cart sidebar shared by every page. Kept apart from functions.py so that
+# pages which only need the sidebar (like the Home page) don't import pandas, plotly or requests.
+
+import streamlit as st
+
+from cart import Cart
+import prewarm
+
+def initialize_session_state():
+    # Check if "objectifs" (goals) is already initialized in session state
+    # If not, initialize it with default values for fats, sugars, salt, and calories
+    if "objectifs" not in st.session_state:
+        st.session_state.objectifs = {"graisses": 70, "sucres": 50, "sel": 6, "calories": 2000}
+
+    # Check if "selected_products" is already initialized in session state
+    # If not, initialize it as an empty cart (this will hold selected products and their nutrient totals)
+    if "selected_products" not in st.session_state:
+        st.session_state.selected_products = Cart()
+    elif not isinstance(st.session_state.selected_products, Cart):
+        # Session started before the cart kept its totals
+        st.session_state.selected_products = Cart(st.session_state.selected_products)
+
+    # Check if "show_search" is already initialized in session state
+    # If not, initialize it as False (controls whether the search interface is shown)
+    if "show_search" not in st.session_state:
+        st.session_state.show_search = False
+
+    # Check if "search_results" is already initialized in session state
+    # If not, initialize it as an empty list (this will hold search results)
+    if "search_results" not in st.session_state:
+        st.session_state.search_results = []
+
+    # Start the cache prewarm worker of the server process (only done once)
+    prewarm.start()
+
+def show_cart_sidebar():
+   with st.sidebar:
+       # Display the sidebar subheader for the cart
+       st.subheader("Cart", anchor="cart-subheader")
+
+       # Check if there are products in the selected_products list
+       if st.session_state.selected_products:
+           # Loop through each selected product and display its name
+           for index, product in enumerate(st.session_state.selected_products):
+               product_name = product.get('product_name', 'Unknown')
+               st.write(f"- {product_name}")
+
+               # Add a button to remove the product from the cart
+               # When clicked, remove the product and show a success message
+               if st.button(f"Remove {product_name}", key=f"remove_{index}", use_container_width=True):
+                   st.session_state.selected_products.pop(index)
+                   st.success(f"{product_name} removed from cart")
+                   st.rerun()  # Re-run the app to update the cart display
+       else:
+           # If the cart is empty, display a message
+           st.write("Your cart is empty.")
+           
+       # Button to add a product to the cart
+       # When clicked, show the product search interface and switch pages
+       if st.button("Add product", key="add_product", use_container_width=True):
+           st.session_state.show_search = True
+           st.switch_page("pages/1 - 🛒 Products.py")
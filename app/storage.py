@@ -0,0 +1,27 @@
+# storage.py
+#
+# Location of the local data (data/ at the root of the project) and the SQLite connections
+# shared by the local stores and caches (product_store, meal_store, response_cache).
+
+import os
+import sqlite3
+import threading
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+_local = threading.local()
+
+# Function to get the connection of the current thread to a database (SQLite connections can't be shared).
+# The database is created with its schema on first use, in WAL mode so readers don't block the writer.
+def connect(path, schema, timeout=5.0):
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    if path not in connections:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = sqlite3.connect(path, timeout=timeout)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(schema)
+        connections[path] = connection
+    return connections[path]
@@ -0,0 +1,39 @@
+# tags.py
+#
+# Shared normalisation of OpenFoodFacts tags ("en:united-kingdom" -> "United-Kingdom").
+# The tag vocabulary is small and repeated on every product, so each tag is cleaned once
+# per process and then resolved from a bounded in-memory cache.
+
+import re
+from functools import lru_cache
+
+# Maximum number of distinct tags kept in the cache
+MAX_CACHED_TAGS = 50_000
+
+PREFIX = re.compile(r'^.*?:')
+SEPARATORS = re.compile(r'[- ]')
+
+# Function to clean a single tag: remove the language prefix and capitalize each part
+@lru_cache(maxsize=MAX_CACHED_TAGS)
+def clean_tag(tag):
+    # Remove prefix before the first colon
+    tag_cleaned = PREFIX.sub('', tag, count=1)
+
+    # Capitalize each part of the string, split by spaces or hyphens, and join them with hyphens
+    return '-'.join([part.capitalize() for part in SEPARATORS.split(tag_cleaned)])
+
+# Function to clean a list of tags
+def clean_prefixes(items):
+    return [clean_tag(item) for item in items]
+
+# Function to clean a whole column of tags at once. Each value is a comma-separated
+# string of tags (or a list of tags when split=False); empty values become "Not available".
+# Tag values repeat a lot across products, so each distinct value is cleaned only once
+# and rows are filled with dictionary lookups.
+def clean_tag_column(values, split=True, missing="Not available"):
+    keys = values if split else [tuple(value) if value else value for value in values]
+    joined = {
+        key: ", ".join(clean_prefixes(key.split(",") if split else key))
+        for key in {key for key in keys if key}
+    }
+    return [joined[key] if key else missing for key in keys]
@@ -0,0 +1,149 @@
+# benchmarks/bench_process_products.py
+#
+# Throughput of process_products (column-oriented) against the previous row-by-row
+# implementation, on synthetic OpenFoodFacts products. Also checks that both outputs are identical.
+#
+#     python benchmarks/bench_process_products.py            # 100, 10k and 1M products
+#     python benchmarks/bench_process_products.py 100 10000  # custom sizes
+
+import os
+import random
+import re
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+from functions import build_products_frame
+
+DEFAULT_SIZES = [100, 10_000, 1_000_000]
+
+# Number of distinct synthetic products; larger inputs reuse them so 1M products fit in memory
+DISTINCT_PRODUCTS = 5_000
+
+COUNTRIES = ["en:france", "en:germany", "en:united-kingdom", "en:spain", "en:belgium", "en:switzerland", "en:italy"]
+LABELS = ["en:organic", "en:vegan", "en:vegetarian", "en:no-gluten", "fr:ab-agriculture-biologique", "en:fair-trade"]
+ALLERGENS = ["en:milk", "en:gluten", "en:nuts", "en:soybeans", "en:eggs"]
+CATEGORIES = ["en:snacks", "en:sweet-snacks", "en:biscuits-and-cakes", "en:beverages", "en:dairies", "en:cheeses"]
+ORIGINS = ["en:france", "en:european-union", "en:non-european-union", "en:italy"]
+NUTRIENTS = ["energy-kcal", "fat", "saturated-fat", "carbohydrates", "sugars", "fiber", "proteins", "salt"]
+
+# Uncached clean_prefixes used by the row-by-row implementation
+def clean_prefixes(items):
+    formatted_items = []
+    for item in items:
+        item_cleaned = re.sub(r'^.*?:', '', item)
+        formatted_item = ' '.join([part.capitalize() for part in re.split(r'[- ]', item_cleaned)])
+        formatted_items.append(formatted_item.replace(" ", "-"))
+    return formatted_items
+
+# Row-by-row implementation of process_products before it was made column-oriented,
+# kept as the reference output and baseline
+def process_products_rowwise(products):
+    processed_data = []  # List to store processed product data
+    
+    # Iterate through each product in the input list
+    for product in products:
+        # Extract basic product information (name, code, URL, etc.)
+        product_data = {
+            "product_name": product.get("product_name", "Unknown"),
+            "code": product.get("code", "Unknown"),
+            "url": product.get("url", "#"),
+            "quantity": product.get("quantity", "Information not available"),
+            "categories": product.get("categories", "Information not available"),
+            "origins": product.get("origins", "Information not available"),
+            "nutriscore_grade": product.get("nutriscore_grade", "Not available").upper(),
+            "ecoscore_grade": product.get("ecoscore_grade", "Not available").upper(),
+            "nova_group": product.get("nova_group", "Not available"),
+            "nutrition_data_per": product.get("nutrition_data_per", "Not available"),
+            "image_url": product.get("image_front_small_url", None)
+        }
+        
+        # List of specific nutrients to extract
+        selected_nutrients = [
+            'energy-kcal_100g',
+            'fat_100g',
+            'saturated-fat_100g',
+            'carbohydrates_100g',
+            'sugars_100g',
+            'fiber_100g',
+            'proteins_100g',
+            'salt_100g'
+        ]
+        
+        # Extracting nutrient values from the product's 'nutriments' field
+        nutriments = product.get("nutriments", {})
+        for nutrient_key in selected_nutrients:
+            nutrient_value = nutriments.get(nutrient_key)
+            # Transform the nutrient name for better readability in the DataFrame
+            nutrient_name = nutrient_key.replace('_100g', '').replace('_unit', '').replace('-', ' ').capitalize()
+            product_data[nutrient_name] = nutrient_value
+        
+        # Clean and process allergens and labels
+        allergens = product.get("allergens", "")
+        product_data["allergens"] = ", ".join(clean_prefixes(allergens.split(","))) if allergens else "Not available"
+        
+        labels = product.get("labels", "")
+        product_data["labels"] = ", ".join(clean_prefixes(labels.split(","))) if labels else "Not available"
+
+        # Clean and process categories and origins
+        categories = product.get("categories", "")
+        product_data["categories"] = ", ".join(clean_prefixes(categories.split(","))) if categories else "Not available"
+        
+        origins = product.get("origins", "")
+        product_data["origins"] = ", ".join(clean_prefixes(origins.split(","))) if origins else "Not available"
+        
+        # Clean and process countries of sale
+        countries = product.get("countries_tags", [])
+        product_data["countries"] = ", ".join(clean_prefixes(countries)) if countries else "Not available"
+        
+        # Add the processed product data to the list
+        processed_data.append(product_data)
+    
+    # Convert the list of product data into a DataFrame and return it
+    return pd.DataFrame(processed_data)
+
+
+# Function to generate a random product shaped like the OpenFoodFacts API output
+def make_product(rng, index):
+    product = {
+        "product_name": f"Product {index}",
+        "code": str(3000000000000 + index),
+        "url": f"https://world.openfoodfacts.org/product/{3000000000000 + index}",
+        "quantity": f"{rng.choice([100, 250, 500, 1000])} g",
+        "nutriscore_grade": rng.choice("abcde"),
+        "ecoscore_grade": rng.choice("abcde"),
+        "nova_group": rng.randint(1, 4),
+        "nutrition_data_per": "100g",
+        "image_front_small_url": f"https://images.openfoodfacts.org/{index}.jpg",
+        "countries_tags": rng.sample(COUNTRIES, rng.randint(0, 3)),
+        "nutriments": {f"{n}_100g": round(rng.uniform(0, 50), 2) for n in NUTRIENTS if rng.random() > 0.1}
+    }
+    # Some text fields are missing or empty, like in the real data
+    for key, vocabulary in (("labels", LABELS), ("allergens", ALLERGENS), ("categories", CATEGORIES), ("origins", ORIGINS)):
+        if rng.random() > 0.2:
+            product[key] = ",".join(rng.sample(vocabulary, rng.randint(0, 3)))
+    return product
+
+# Function to build a list of `size` products (references to a pool of distinct products)
+def make_products(size, seed=0):
+    rng = random.Random(seed)
+    pool = [make_product(rng, i) for i in range(min(size, DISTINCT_PRODUCTS))]
+    return [pool[i % len(pool)] for i in range(size)]
+
+# Function to time a function on a list of products
+def timed(function, products):
+    start = time.perf_counter()
+    result = function(products)
+    return result, time.perf_counter() - start
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in sys.argv[1:]] or DEFAULT_SIZES
+    print(f"{'products':>10} {'row-by-row':>14} {'columnar':>14} {'speed-up':>9}")
+    for size in sizes:
+        products = make_products(size)
+        expected, rowwise_time = timed(process_products_rowwise, products)
+        result, columnar_time = timed(build_products_frame, products)
+        pd.testing.assert_frame_equal(result, expected)
+        print(f"{size:>10} {size / rowwise_time:>10.0f} p/s {size / columnar_time:>10.0f} p/s {rowwise_time / columnar_time:>8.1f}x")
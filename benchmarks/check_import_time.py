@@ -0,0 +1,83 @@
+# benchmarks/check_import_time.py
+#
+# Import-time budget of the Home page, measured with `python -X importtime`.
+# The imports of the Home page are run in a fresh interpreter (after streamlit, which every
+# page needs anyway); the check fails if they take longer than the budget or if they load
+# one of the heavy libraries the Home page doesn't use. The other pages are reported too.
+#
+#     python benchmarks/check_import_time.py                 # default budget
+#     python benchmarks/check_import_time.py --budget-ms 20
+
+import argparse
+import ast
+import glob
+import os
+import re
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+HOME_PAGE = glob.glob(os.path.join(APP_DIR, "0_*Home*.py"))[0]
+
+# Import time allowed for the Home page's own modules (on top of streamlit)
+DEFAULT_BUDGET_MS = 30
+
+# Libraries the Home page must never load
+FORBIDDEN_MODULES = ["pandas", "numpy", "plotly.express", "plotly.graph_objects", "pyarrow", "PIL", "requests"]
+
+# Each measure is repeated and the fastest run is kept, to limit the noise
+RUNS = 5
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+# Function to get the import statements at the top level of a page
+def page_imports(path):
+    with open(path, encoding="utf-8") as file:
+        tree = ast.parse(file.read())
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+# Function to run imports in a fresh interpreter after streamlit.
+# Returns the time of the page's own imports (in ms) and every module loaded for them.
+def measure(imports):
+    code = "import streamlit\n" + "\n".join(line for line in imports if line != "import streamlit as st")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR, capture_output=True, text=True, check=True
+    )
+
+    # The lines of streamlit come first: everything after its top-level line belongs to the page
+    entries = [match.groups() for match in map(LINE.match, result.stderr.splitlines()) if match]
+    start = next(i for i, (_, _, indent, name) in enumerate(entries) if name == "streamlit" and not indent) + 1
+    page_entries = entries[start:]
+    total_us = sum(int(cumulative) for _, cumulative, indent, _ in page_entries if not indent)
+    return total_us / 1000, {name for _, _, _, name in page_entries}
+
+# Function to measure a page several times and keep the fastest run
+def best_of(imports, runs=RUNS):
+    results = [measure(imports) for _ in range(runs)]
+    return min(results, key=lambda result: result[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time budget of the Home page")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Budget of the Home page imports")
+    args = parser.parse_args()
+
+    # Other pages, for information
+    for page in sorted(glob.glob(os.path.join(APP_DIR, "pages", "*.py"))):
+        page_ms, _ = best_of(page_imports(page), runs=1)
+        print(f"{os.path.basename(page):35} {page_ms:8.1f} ms")
+
+    home_ms, modules = best_of(page_imports(HOME_PAGE))
+    print(f"{os.path.basename(HOME_PAGE):35} {home_ms:8.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    failures = []
+    if home_ms > args.budget_ms:
+        failures.append(f"Home page imports take {home_ms:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+    for module in FORBIDDEN_MODULES:
+        if module in modules:
+            failures.append(f"Home page imports {module}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
@@ -1,14 +1,19 @@
 import streamlit as st
-import requests
 import plotly.express as px
 import pandas as pd
-import time
-import re
+import os
+import sys
+
+# Rendre les modules partagés de app/ importables depuis les scripts à la racine
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+from http_client import http_get
+from tags import clean_prefixes
+from image_cache import thumbnail
 
 # Fonction pour obtenir un produit par recherche par nom
 def search_product(query):
     url = f"https://world.openfoodfacts.org/cgi/search.pl?search_terms={query}&search_simple=1&action=process&json=1"
-    response = requests.get(url)
+    response = http_get(url)
     if response.status_code == 200:
         data = response.json()
         return data.get('products', [])
@@ -20,9 +25,6 @@ def search_product(query):
 @st.cache_data
 def search_product_by_category(category):
     url = f"https://world.openfoodfacts.org/category/{category}.json"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
     
     products = []
     page = 1  # Commence à la première page
@@ -34,7 +36,7 @@ def search_product_by_category(category):
     
     # On récupère jusqu'à 10 produits
     while len(products) < 10:  
-        response = requests.get(f"{url}?page={page}", headers=headers)
+        response = http_get(url, params={"page": page})
         
         if response.status_code == 200:
             data = response.json()
@@ -52,8 +54,9 @@ def search_product_by_category(category):
             page += 1
         
         elif response.status_code == 429:
-            st.warning("Limite de requêtes atteinte. Attente avant de réessayer...")
-            time.sleep(10)
+            # http_get a déjà respecté Retry-After et réessayé : le quota de requêtes est épuisé
+            st.warning("Limite de requêtes atteinte. Réessayez dans quelques instants.")
+            break
         else:
             st.error(f"Erreur lors de la récupération des produits : {response.status_code}")
             break
@@ -61,19 +64,6 @@ def search_product_by_category(category):
     return products[:10]
 
 
-# Fonction pour nettoyer les préfixes et formater chaque mot avec la première lettre en majuscule
-def clean_prefixes(items):
-    formatted_items = []
-    for item in items:
-        # Retirer tout préfixe avant ':'
-        item_cleaned = re.sub(r'^.*?:', '', item)
-        # Capitaliser chaque sous-partie
-        formatted_item = ' '.join([part.capitalize() for part in re.split(r'[- ]', item_cleaned)])
-        # Remettre les tirets pour avoir le bon format de pays
-        formatted_item = formatted_item.replace(" ", "-")
-        formatted_items.append(formatted_item)
-    return formatted_items
-
 # Fonction pour afficher la carte des pays de vente avec préfixes nettoyés
 def display_sales_map(countries, zoom_country=None):
     if countries:
@@ -329,7 +319,7 @@ if st.session_state.show_search:
                 # Vérifier si l'URL de l'image existe et afficher l'image
                 if image_url:
                     # Afficher l'image avec une taille fixe de 150px de largeur
-                    st.image(image_url, caption=product_name, use_column_width=False, width=150)  # Redimensionner l'image
+                    st.image(thumbnail(image_url, 150), caption=product_name, use_column_width=False, width=150)  # Redimensionner l'image
                 else:
                     st.write("Aucune image disponible.")
                 
@@ -1,14 +1,26 @@
 import streamlit as st
 import requests
-import re
+import os
+import sys
+
+# Rendre les modules partagés de app/ importables depuis les scripts à la racine
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+from http_client import http_get
+from tags import clean_prefixes
+import product_store
+from image_cache import thumbnail
 
 # Fonction pour obtenir les produits par catégorie
 def get_products_by_category(category):
+    # Utiliser la base locale de produits si elle a été construite
+    if product_store.is_available():
+        products = product_store.get_products_by_category(category)
+        if products:
+            return products
+        # Catégorie absente de la base locale : interroger l'API
+
     url = f"https://world.openfoodfacts.org/category/{category}.json"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    response = requests.get(url, headers=headers)
+    response = http_get(url)
     if response.status_code == 200:
         products = response.json().get('products', [])
         if not products:
@@ -21,11 +33,8 @@ def get_products_by_category(category):
 # Fonction pour obtenir les catégories disponibles
 def get_categories():
     url = "https://world.openfoodfacts.org/categories.json"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
     try:
-        response = requests.get(url, headers=headers)
+        response = http_get(url)
         response.raise_for_status()  # Lancer une erreur pour les codes de statut non 200
         json_data = response.json()
         return [category['name'] for category in json_data.get('tags', [])]  # Utilisation de 'tags'
@@ -36,16 +45,6 @@ def get_categories():
         st.error(f"Erreur lors du décodage du JSON : {e}")
         return []
 
-# Fonction pour nettoyer les préfixes et formater chaque mot avec la première lettre en majuscule
-def clean_prefixes(items):
-    formatted_items = []
-    for item in items:
-        item_cleaned = re.sub(r'^.*?:', '', item)  # Retirer le préfixe avant ':'
-        formatted_item = ' '.join([part.capitalize() for part in re.split(r'[- ]', item_cleaned)])  # Capitaliser chaque sous-partie
-        formatted_item = formatted_item.replace(" ", "-")  # Remettre les tirets
-        formatted_items.append(formatted_item)
-    return formatted_items
-
 # Liste des nutriments spécifiques à afficher
 selected_nutrients = [
     'carbohydrates_100g', 'carbohydrates_unit',
@@ -88,11 +87,16 @@ if categories:
 
     # Bouton pour afficher les produits
     if st.button("Afficher les produits"):
-        products = get_products_by_category(category)
-        
-        # Filtrer les produits en fonction de la requête de recherche
-        if search_query:
-            products = [p for p in products if search_query.lower() in p.get('product_name', '').lower()]
+        products = []
+        if search_query and product_store.is_available():
+            # Recherche plein texte dans la base locale (classée par pertinence, sans accents)
+            products = product_store.search_products(search_query, category=category)
+        if not products:
+            products = get_products_by_category(category)
+            
+            # Filtrer les produits en fonction de la requête de recherche
+            if search_query:
+                products = [p for p in products if search_query.lower() in p.get('product_name', '').lower()]
 
         if products:
             for product in products:
@@ -164,7 +168,7 @@ if categories:
                     # Afficher l'image du produit
                     image_url = product.get('image_front_small_url', None)  # Récupérer l'URL de l'image
                     if image_url:
-                        st.image(image_url, caption=product.get('product_name', 'Inconnu'), width=150)  # Spécifiez la largeur ici
+                        st.image(thumbnail(image_url, 150), caption=product.get('product_name', 'Inconnu'), width=150)  # Spécifiez la largeur ici
                     else:
                         st.write("Aucune image disponible.")
                 
@@ -1,16 +1,17 @@
 import streamlit as st
-import requests
-import time
 import pandas as pd
-import re
+import os
+import sys
+
+# Rendre les modules partagés de app/ importables depuis les scripts à la racine
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+from http_client import http_get
+from tags import clean_prefixes
 
 # Utiliser @st.cache_data pour mettre en cache les données traitées
 @st.cache_data
 def fetch_data(category):
     url = f"https://world.openfoodfacts.org/category/{category}.json"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
     
     products = []
     page = 1  # Commence à la première page
@@ -21,7 +22,7 @@ def fetch_data(category):
     ]
 
     while len(products) < 20:  # Continue jusqu'à obtenir 50 produits valides
-        response = requests.get(f"{url}?page={page}", headers=headers)
+        response = http_get(url, params={"page": page})
         
         if response.status_code == 200:
             data = response.json()
@@ -38,24 +39,15 @@ def fetch_data(category):
             page += 1
         
         elif response.status_code == 429:
-            st.warning("Limite de requêtes atteinte. Attente avant de réessayer...")
-            time.sleep(10)
+            # http_get a déjà respecté Retry-After et réessayé : le quota de requêtes est épuisé
+            st.warning("Limite de requêtes atteinte. Réessayez dans quelques instants.")
+            break
         else:
             st.error(f"Erreur lors de la récupération des produits : {response.status_code}")
             break
 
     return products[:50]
 
-# Fonction de nettoyage des préfixes
-def clean_prefixes(items):
-    formatted_items = []
-    for item in items:
-        item_cleaned = re.sub(r'^.*?:', '', item)
-        formatted_item = ' '.join([part.capitalize() for part in re.split(r'[- ]', item_cleaned)])
-        formatted_items.append(formatted_item.replace(" ", "-"))
-    return formatted_items
-
-
 # Utiliser @st.cache_data pour mettre en cache le traitement des produits
 @st.cache_data
 def process_products(products):
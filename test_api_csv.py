@@ -2,17 +2,24 @@ import streamlit as st
 import requests
 import time
 import pandas as pd
-import re
-import os
 from pathlib import Path
+import os
+import sys
+
+# Rendre les modules partagés de app/ importables depuis les scripts à la racine
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+from http_client import http_get
+from tags import clean_prefixes
+from category_cache import cache_path, load_category_frame, save_category_frame
+
+# Les DataFrames de ce script n'ont pas les mêmes colonnes que ceux de l'application :
+# ils sont rangés à part dans le cache
+PRODUCER = "test_api_csv"
 
 # Utiliser @st.cache_data pour mettre en cache les données traitées
 @st.cache_data
 def fetch_data(category):
     url = f"https://world.openfoodfacts.org/category/{category}.json"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko)'
-    }
     
     products = []
     page = 1  # Commence à la première page
@@ -24,7 +31,7 @@ def fetch_data(category):
 
     while len(products) < 30 and page <= 5:  # Limite à 30 produits ou 5 pages
         try:
-            response = requests.get(f"{url}?page={page}", headers=headers, timeout=10)
+            response = http_get(url, params={"page": page}, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -41,11 +48,9 @@ def fetch_data(category):
                 page += 1
             
             elif response.status_code == 429:
-                st.warning("Limite de requêtes atteinte. Attente avant de réessayer...")
-                time.sleep(10)  # Pause de 10 secondes
-            elif response.status_code == 504:
-                st.warning("Erreur 504 : Timeout du serveur. Réessai dans quelques secondes...")
-                time.sleep(5)  # Réessayer après 5 secondes
+                # http_get a déjà respecté Retry-After et réessayé : le quota de requêtes est épuisé
+                st.warning("Limite de requêtes atteinte. Réessayez dans quelques instants.")
+                break
             else:
                 st.error(f"Erreur lors de la récupération des produits : {response.status_code}")
                 break
@@ -60,16 +65,6 @@ def fetch_data(category):
     return products[:30]
 
 
-# Fonction de nettoyage des préfixes
-def clean_prefixes(items):
-    formatted_items = []
-    for item in items:
-        item_cleaned = re.sub(r'^.*?:', '', item)
-        formatted_item = ' '.join([part.capitalize() for part in re.split(r'[- ]', item_cleaned)])
-        formatted_items.append(formatted_item.replace(" ", "-"))
-    return formatted_items
-
-
 # Utiliser @st.cache_data pour mettre en cache le traitement des produits
 @st.cache_data
 def process_products(products):
@@ -131,20 +126,19 @@ def process_products(products):
 
 
 def get_category_data(category):
-    # Nom du fichier CSV pour la catégorie
-    csv_file = f"{category}.csv"
-    
-    if os.path.exists(csv_file):
-        st.write(f"Chargement des données depuis le fichier CSV pour la catégorie : {category}")
-        df_processed = pd.read_csv(csv_file)
+    # Cache colonnaire partagé avec l'application (voir app/category_cache.py)
+    df_processed = load_category_frame(category, producer=PRODUCER)
+
+    if df_processed is not None:
+        st.write(f"Chargement des données depuis le cache pour la catégorie : {category}")
     else:
         st.write(f"Téléchargement et traitement des données pour la catégorie : {category}")
         products = fetch_data(category)
         if products:
             df_processed = process_products(products)
-            # Enregistrement du DataFrame dans un fichier CSV
-            df_processed.to_csv(csv_file, index=False)
-            st.write(f"Données enregistrées dans le fichier : {csv_file}")
+            # Enregistrement du DataFrame dans le cache
+            save_category_frame(category, df_processed, producer=PRODUCER)
+            st.write(f"Données enregistrées dans le cache : {cache_path(category, PRODUCER)}")
         else:
             st.warning(f"Aucun produit trouvé pour la catégorie : {category}.")
             df_processed = pd.DataFrame()  # DataFrame vide si aucun produit